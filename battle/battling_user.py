@@ -1,14 +1,79 @@
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING, List
+from typing import TYPE_CHECKING, Iterable, List, Sequence, Set, Tuple
 
 if TYPE_CHECKING:
     import discord
     from ballsdex.core.models import BallInstance, Player
 
 
+@dataclass(slots=True, frozen=True)
+class BallSnapshot:
+    """
+    Battle-relevant data of a ball instance, copied when it joins a roster.
+    """
+
+    pk: int
+    ball_id: int
+    country: str
+    emoji_id: int
+    attack: int
+    health: int
+
+    @classmethod
+    def from_instance(cls, ball: "BallInstance") -> "BallSnapshot":
+        countryball = ball.countryball
+        return cls(
+            ball.pk, countryball.pk, countryball.country, countryball.emoji_id, ball.attack, ball.health
+        )
+
+    @property
+    def stats(self) -> Tuple[int, int]:
+        return (self.attack, self.health)
+
+
 @dataclass(slots=True)
 class BattlingUser:
     user: "discord.User | discord.Member"
     player: "Player"
-    proposal: List["BallInstance"] = field(default_factory=list)
-    locked: bool = False
\ No newline at end of file
+    proposal: List[BallSnapshot] = field(default_factory=list)
+    proposal_ids: Set[int] = field(default_factory=set)
+    locked: bool = False
+    # bumped on every roster change so rendered text can be cached
+    revision: int = 0
+
+    def has_ball(self, pk: int) -> bool:
+        return pk in self.proposal_ids
+
+    def add_ball(self, ball: "BallInstance") -> bool:
+        """Snapshot and add a ball to the roster. Returns False if it was already there."""
+        if ball.pk in self.proposal_ids:
+            return False
+        self.proposal.append(BallSnapshot.from_instance(ball))
+        self.proposal_ids.add(ball.pk)
+        self.revision += 1
+        return True
+
+    def add_balls(self, balls: Iterable["BallInstance"]):
+        for ball in balls:
+            self.add_ball(ball)
+
+    def replace_balls(self, balls: Iterable["BallInstance"]):
+        """Replace the whole roster, keeping the given order."""
+        self.proposal = []
+        self.proposal_ids = set()
+        self.revision += 1
+        self.add_balls(balls)
+
+    def remove_ball(self, pk: int) -> bool:
+        """Remove a ball from the roster. Returns False if it was not there."""
+        if pk not in self.proposal_ids:
+            return False
+        self.proposal_ids.discard(pk)
+        self.proposal = [ball for ball in self.proposal if ball.pk != pk]
+        self.revision += 1
+        return True
+
+    def reorder(self, order: Sequence[int]):
+        """Rearrange the roster, `order` being indexes into the current proposal."""
+        self.proposal = [self.proposal[i] for i in order]
+        self.revision += 1
@@ -0,0 +1,140 @@
+import random
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+BASE_CRIT_CHANCE = 0.08
+MIN_CRIT_CHANCE = 0.05
+MAX_CRIT_CHANCE = 0.2
+CRIT_ADVANTAGE_SCALE = 0.3
+CRIT_MULTIPLIER = 1.3
+MAX_MITIGATION = 0.2
+MAX_TURNS = 10
+
+ROUND_START = 0
+FIRST_STRIKE = 1
+ATTACK = 2
+CRIT = 3
+KNOCKOUT = 4
+DRAW = 5
+ROUND_WIN = 6
+
+# (attack, health)
+Stats = Tuple[int, int]
+
+
+class Event(NamedTuple):
+    """
+    A single entry of the battle log.
+
+    `side` is the attacker for attacks, the defeated side for knockouts and the
+    winner for round wins. `roll` is a random byte used only to pick flavor text.
+    """
+
+    code: int
+    side: int = 0
+    damage: float = 0.0
+    hp: float = 0.0
+    mitigation: float = 0.0
+    roll: int = 0
+
+
+class RoundResult(NamedTuple):
+    number: int
+    fighters: Tuple[Stats, Stats]
+    winner: int
+    events: List[Event]
+
+
+class BattleResult(NamedTuple):
+    seed: int
+    rounds: List[RoundResult]
+    wins: Tuple[int, int]
+
+    @property
+    def winner(self) -> int:
+        """1 or 2 for the side with more round wins, 0 for a draw."""
+        if self.wins[0] > self.wins[1]:
+            return 1
+        if self.wins[1] > self.wins[0]:
+            return 2
+        return 0
+
+
+def crit_chance(attack: int, defender_health: int) -> float:
+    attack_advantage = attack / (defender_health + 1)
+    chance = BASE_CRIT_CHANCE * (1 + attack_advantage * CRIT_ADVANTAGE_SCALE)
+    return min(max(chance, MIN_CRIT_CHANCE), MAX_CRIT_CHANCE)
+
+
+def mitigation(attack: int, defender_health: int) -> float:
+    return min(defender_health / (max(attack, 1) * 4), MAX_MITIGATION)
+
+
+def attack_damage(attack: int, defender_health: int, is_crit: bool) -> float:
+    base_damage = attack * (1 - mitigation(attack, defender_health))
+    if is_crit:
+        return max(base_damage * CRIT_MULTIPLIER, attack * CRIT_MULTIPLIER)
+    return base_damage
+
+
+def simulate_round(
+    number: int, fighter1: Stats, fighter2: Stats, rng: random.Random
+) -> RoundResult:
+    """Resolve a single duel between two stat snapshots."""
+    fighters = (fighter1, fighter2)
+    hp = [float(fighter1[1]), float(fighter2[1])]
+    first = rng.choice((1, 2))
+    events = [Event(ROUND_START), Event(FIRST_STRIKE, first)]
+    winner = 0
+
+    for _ in range(MAX_TURNS):
+        for attacker in (first, 3 - first):
+            defender = 3 - attacker
+            attack = fighters[attacker - 1][0]
+            defender_health = fighters[defender - 1][1]
+            is_crit = rng.random() < crit_chance(attack, defender_health)
+            damage = attack_damage(attack, defender_health, is_crit)
+            hp[defender - 1] -= damage
+            events.append(
+                Event(
+                    CRIT if is_crit else ATTACK,
+                    attacker,
+                    damage,
+                    hp[defender - 1],
+                    mitigation(attack, defender_health),
+                    rng.getrandbits(8),
+                )
+            )
+            if hp[defender - 1] <= 0:
+                events.append(Event(KNOCKOUT, defender))
+                winner = attacker
+                break
+        if winner:
+            break
+
+    if winner:
+        events.append(Event(ROUND_WIN, winner, roll=rng.getrandbits(8)))
+    else:
+        events.append(Event(DRAW))
+    return RoundResult(number, fighters, winner, events)
+
+
+def simulate_battle(
+    roster1: Sequence[Stats], roster2: Sequence[Stats], seed: Optional[int] = None
+) -> BattleResult:
+    """
+    Resolve a whole battle without touching Discord.
+
+    Balls are paired by position and extra balls on the longer roster sit out.
+    The same seed and rosters always produce the same result.
+    """
+    if seed is None:
+        seed = random.getrandbits(64)
+    rng = random.Random(seed)
+    rounds = []
+    wins = [0, 0]
+    for i, (fighter1, fighter2) in enumerate(zip(roster1, roster2)):
+        result = simulate_round(i + 1, tuple(fighter1), tuple(fighter2), rng)
+        if result.winner:
+            wins[result.winner - 1] += 1
+        rounds.append(result)
+    return BattleResult(seed, rounds, (wins[0], wins[1]))
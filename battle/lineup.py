@@ -0,0 +1,121 @@
+from typing import List, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, /battle auto-order is disabled without it
+    np = None
+
+from ballsdex.packages.battle.engine import MAX_TURNS, Stats
+from ballsdex.packages.battle.odds import damage_table
+
+LINEUP_AVAILABLE = np is not None
+
+
+def _kill_cdf(attack, health):
+    """
+    P(defender is down after k hits) for k = 0..MAX_TURNS, for every pair.
+
+    With j crits out of k hits the damage dealt is fixed, so this is a sum of
+    binomial terms over the number of crits.
+    """
+    crit, base, crit_damage = damage_table(attack, health)
+    cdf = np.zeros((MAX_TURNS + 1,) + np.shape(crit))
+    binomial = [1.0]
+    for k in range(1, MAX_TURNS + 1):
+        binomial = [1.0] + [binomial[j - 1] + binomial[j] for j in range(1, k)] + [1.0]
+        for j in range(k + 1):
+            dealt = (k - j) * base + j * crit_damage
+            probability = binomial[j] * crit**j * (1 - crit) ** (k - j)
+            cdf[k] += np.where(dealt >= health, probability, 0)
+    return cdf
+
+
+def duel_matrix(mine: Sequence[Stats], theirs: Sequence[Stats]) -> Tuple["np.ndarray", "np.ndarray"]:
+    """
+    Exact win and loss probabilities of each of my balls against each of theirs.
+
+    Both matrices have one row per ball in `mine` and one column per ball in `theirs`.
+    """
+    if np is None:
+        raise RuntimeError("numpy is required to compute lineups.")
+    mine_stats = np.asarray(mine, dtype=np.float64).reshape(-1, 2)
+    their_stats = np.asarray(theirs, dtype=np.float64).reshape(-1, 2)
+    attack1, health1 = mine_stats[:, 0:1], mine_stats[:, 1:2]
+    attack2, health2 = their_stats[None, :, 0], their_stats[None, :, 1]
+    # cdf1[k]: I took them down within k hits, cdf2[k]: they took me down within k hits
+    cdf1 = _kill_cdf(attack1, health2)
+    cdf2 = _kill_cdf(attack2, health1)
+    hit1 = cdf1[1:] - cdf1[:-1]
+    hit2 = cdf2[1:] - cdf2[:-1]
+    # My k-th hit lands before their k-th hit when I strike first, after it otherwise.
+    win_first = (hit1 * (1 - cdf2[:-1])).sum(axis=0)
+    loss_first = (hit2 * (1 - cdf1[1:])).sum(axis=0)
+    win_second = (hit1 * (1 - cdf2[1:])).sum(axis=0)
+    loss_second = (hit2 * (1 - cdf1[:-1])).sum(axis=0)
+    return (win_first + win_second) / 2, (loss_first + loss_second) / 2
+
+
+def solve_assignment(cost: "np.ndarray") -> List[int]:
+    """
+    Hungarian algorithm on a square cost matrix.
+
+    Returns the column assigned to each row, minimising the total cost. Runs in
+    O(n^3) with the inner loop over columns vectorised.
+    """
+    n = cost.shape[0]
+    u = np.zeros(n + 1)
+    v = np.zeros(n + 1)
+    owner = np.zeros(n + 1, dtype=np.int64)  # row assigned to each column, 0 if free
+    way = np.zeros(n + 1, dtype=np.int64)
+    for row in range(1, n + 1):
+        owner[0] = row
+        column = 0
+        min_slack = np.full(n + 1, np.inf)
+        used = np.zeros(n + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current_row = owner[column]
+            slack = cost[current_row - 1] - u[current_row] - v[1:]
+            free = ~used[1:]
+            improved = free & (slack < min_slack[1:])
+            min_slack[1:][improved] = slack[improved]
+            way[1:][improved] = column
+            candidates = np.where(free, min_slack[1:], np.inf)
+            next_column = int(np.argmin(candidates)) + 1
+            delta = candidates[next_column - 1]
+            used_columns = np.flatnonzero(used)
+            u[owner[used_columns]] += delta
+            v[used_columns] -= delta
+            min_slack[1:][free] -= delta
+            column = next_column
+            if owner[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            owner[column] = owner[previous]
+            column = previous
+    assignment = [0] * n
+    for column in range(1, n + 1):
+        assignment[owner[column] - 1] = column - 1
+    return assignment
+
+
+def best_order(mine: Sequence[Stats], theirs: Sequence[Stats]) -> List[int]:
+    """
+    Order my roster against a known opponent lineup.
+
+    Returns indexes into `mine`. Balls are placed to maximise the expected number
+    of round wins minus round losses; balls that would not get an opponent are
+    kept at the end in their current order.
+    """
+    slots = min(len(mine), len(theirs))
+    if slots == 0:
+        return list(range(len(mine)))
+    win, loss = duel_matrix(mine, theirs[:slots])
+    cost = np.zeros((len(mine), len(mine)))
+    # Extra columns are bench slots with no score.
+    cost[:, :slots] = loss - win
+    assignment = solve_assignment(cost)
+    playing = sorted((i for i in range(len(mine)) if assignment[i] < slots), key=assignment.__getitem__)
+    bench = [i for i in range(len(mine)) if assignment[i] >= slots]
+    return playing + bench
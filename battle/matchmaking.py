@@ -0,0 +1,137 @@
+import heapq
+import itertools
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+MATCH_RANGE = 200.0
+QUEUE_TIMEOUT = 5 * 60
+# Ratings are grouped in bands this wide, a match is searched band by band.
+RATING_BAND = 25.0
+
+
+@dataclass(slots=True)
+class QueueEntry:
+    user_id: int
+    rating: float
+    # whatever the caller needs to start the battle, e.g. the interaction and mode
+    data: Any = None
+    deadline: Any = None
+    order: int = 0
+
+
+class MatchQueue:
+    """
+    Players waiting for an opponent in one server, grouped in rating bands.
+
+    Each band is a heap of its players by join order. Joining is a heap push,
+    leaving only forgets the player and their heap slot is skipped once it
+    reaches the top. Matching looks at the oldest player of each band within
+    range, nearest band first, so its cost depends on the match range and not
+    on the number of waiting players.
+    """
+
+    def __init__(self, band: float = RATING_BAND):
+        self.band = band
+        self._bands: Dict[int, List[Tuple[int, QueueEntry]]] = {}
+        self._by_user: Dict[int, QueueEntry] = {}
+        self._counter = itertools.count()
+        # heap slots of players who left, cleaned up once they outnumber the others
+        self._stale = 0
+
+    def __len__(self) -> int:
+        return len(self._by_user)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._by_user
+
+    def _band_of(self, rating: float) -> int:
+        return math.floor(rating / self.band)
+
+    def push(self, entry: QueueEntry):
+        if entry.user_id in self._by_user:
+            raise ValueError(f"User {entry.user_id} is already queued.")
+        entry.order = next(self._counter)
+        heapq.heappush(self._bands.setdefault(self._band_of(entry.rating), []), (entry.order, entry))
+        self._by_user[entry.user_id] = entry
+
+    def remove(self, user_id: int) -> Optional[QueueEntry]:
+        entry = self._by_user.pop(user_id, None)
+        if entry is None:
+            return None
+        self._stale += 1
+        if self._stale > len(self._by_user) + 64:
+            self._compact()
+        return entry
+
+    def _compact(self):
+        """Rebuild the bands without the players who left."""
+        bands: Dict[int, List[Tuple[int, QueueEntry]]] = {}
+        for entry in self._by_user.values():
+            bands.setdefault(self._band_of(entry.rating), []).append((entry.order, entry))
+        for heap in bands.values():
+            heapq.heapify(heap)
+        self._bands = bands
+        self._stale = 0
+
+    def _oldest(self, band: int) -> Optional[QueueEntry]:
+        heap = self._bands.get(band)
+        while heap:
+            entry = heap[0][1]
+            if self._by_user.get(entry.user_id) is entry:
+                return entry
+            heapq.heappop(heap)
+            self._stale -= 1
+        if heap is not None:
+            del self._bands[band]
+        return None
+
+    def pop_match(self, rating: float, max_gap: float = MATCH_RANGE) -> Optional[QueueEntry]:
+        """
+        Remove and return a waiting player within about `max_gap` of `rating`, if any.
+
+        The range is rounded up to whole bands, so a match can be up to two bands
+        further than `max_gap`. The oldest player of the nearest band wins, the
+        closer rating breaking ties between the bands on both sides.
+        """
+        center = self._band_of(rating)
+        for distance in range(math.ceil(max_gap / self.band) + 1):
+            best: Optional[QueueEntry] = None
+            for band in {center - distance, center + distance}:
+                entry = self._oldest(band)
+                if entry and (best is None or abs(entry.rating - rating) < abs(best.rating - rating)):
+                    best = entry
+            if best is not None:
+                self.remove(best.user_id)
+                return best
+        return None
+
+
+def benchmark(size: int = 50_000, seed: int = 0) -> Tuple[float, float]:
+    """
+    Fill a queue with `size` simulated players, then match as many newcomers.
+
+    Checks that every match is within range and returns the average time of a
+    push and of a pop_match, in seconds.
+    """
+    rng = random.Random(seed)
+    queue = MatchQueue()
+    start = time.perf_counter()
+    for user_id in range(size):
+        queue.push(QueueEntry(user_id, rng.gauss(1000, 200)))
+    pushed = time.perf_counter()
+    for _ in range(size):
+        rating = rng.gauss(1000, 200)
+        match = queue.pop_match(rating)
+        assert match is None or abs(match.rating - rating) < MATCH_RANGE + 2 * queue.band
+        assert match is None or match.user_id not in queue
+    matched = time.perf_counter()
+    return (pushed - start) / size, (matched - pushed) / size
+
+
+if __name__ == "__main__":
+    for size in (10_000, 50_000, 200_000):
+        push, match = benchmark(size)
+        print(f"{size} entries: {push * 1e6:.2f}µs per push, {match * 1e6:.2f}µs per match")
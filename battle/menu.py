@@ -1,16 +1,34 @@
 import asyncio
 import discord
+import math
 import random
-from datetime import timedelta
+import time
 from discord.ui import View, Button
-from typing import TYPE_CHECKING, List, Optional, Set
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Set, Tuple
 from discord import app_commands
-
-from ballsdex.packages.battle.battling_user import BattlingUser
+from tortoise.expressions import Q
+from tortoise.queryset import QuerySet
+
+from ballsdex.packages.battle.battling_user import BallSnapshot, BattlingUser
+from ballsdex.packages.battle.engine import BattleResult, RoundResult, simulate_battle
+from ballsdex.packages.battle.odds import ODDS_AVAILABLE, estimate_odds
+from ballsdex.packages.battle.playback import (
+    BATTLE_START_DELAY,
+    EVENT_DELAYS,
+    SCORE_DELAY,
+    PlaybackMode,
+)
+from ballsdex.packages.battle.raid import RAID_JOIN_WINDOW, RAID_TICK_DELAY, Raid, Tick
+from ballsdex.packages.battle.ratings import RatingRow
+from ballsdex.packages.battle.render import LogBuffer, render_event
+from ballsdex.packages.battle.replay import Replay, encode_replay
+from ballsdex.packages.battle.stats import round_stats
+from ballsdex.packages.battle.timers import Deadline
 from ballsdex.settings import settings
-from ballsdex.core.models import BallInstance, Player
+from ballsdex.core.models import Ball, BallInstance, Player, balls
 from ballsdex.core.utils.transformers import BallInstanceTransform
 from ballsdex.core.utils.paginator import Pages
+from ballsdex.core.utils.sorting import SortingChoices, sort_balls
 from ballsdex.core.utils import menus
 from ballsdex.core.utils.buttons import ConfirmChoiceView
 
@@ -18,6 +36,10 @@ if TYPE_CHECKING:
     from ballsdex.core.bot import BallsDexBot
     from ballsdex.packages.battle.cog import Battle as BattleCog
 
+# Seconds after the start of a battle.
+BATTLE_WARNING = 25 * 60
+BATTLE_TIMEOUT = 30 * 60
+
 
 class BattleMenu:
     def __init__(
@@ -26,18 +48,28 @@ class BattleMenu:
         interaction: discord.Interaction["BallsDexBot"],
         battler1: BattlingUser,
         battler2: BattlingUser,
+        mode: PlaybackMode = PlaybackMode.cinematic,
     ):
         self.cog = cog
+        self.playback = cog.playback
+        self.mode = mode
         self.bot = interaction.client
         self.channel: discord.TextChannel = interaction.channel
         self.battler1 = battler1
         self.battler2 = battler2
         self.embed = discord.Embed()
-        self.task: Optional[asyncio.Task] = None
+        self.deadlines: List[Deadline] = []
         self.current_view: BattleView = BattleView(self)
         self.message: Optional[discord.Message] = None
         self.is_cancelled = False
+        # set while the battle message is being sent, before `message` is known
+        self.is_starting = False
         self.MAX_BALLS = 10
+        self.UPDATE_DEBOUNCE = 2
+        self._dirty = False
+        self._flush_task: Optional[asyncio.Task] = None
+        # user id -> (roster revision, rendered field text)
+        self._roster_fields: Dict[int, Tuple[int, str]] = {}
 
     def get_battler(self, user: discord.User) -> Optional[BattlingUser]:
         if user.id == self.battler1.user.id:
@@ -60,120 +92,174 @@ class BattleMenu:
             "*This battle times out after 30 minutes.*"
         )
         self.embed.set_footer(
-            text="This message refreshes every 15 seconds so you can keep adjusting your roster."
+            text="This message updates as both players adjust their rosters."
         )
         self.embed.clear_fields()
 
-        def format_proposal(proposal):
-            display_balls = proposal[:10]
-            more_balls = len(proposal) - len(display_balls)
-            display_message = "\n".join(
-                f"- {self.bot.get_emoji(ball.countryball.emoji_id)} {ball.countryball.country} (#{ball.id:0X})"
-                for ball in display_balls
-            )
-            if more_balls > 0:
-                display_message += f"\n...and {more_balls} more."
-            return display_message or "No balls selected yet."
-
         self.embed.add_field(
             name=f"{self.battler1.user.display_name} roster",
-            value=format_proposal(self.battler1.proposal),
+            value=self.format_roster(self.battler1),
             inline=True,
         )
         self.embed.add_field(
             name=f"{self.battler2.user.display_name} roster",
-            value=format_proposal(self.battler2.proposal),
+            value=self.format_roster(self.battler2),
             inline=True,
         )
 
+    def format_roster(self, battler: BattlingUser) -> str:
+        """Roster field text of a battler, rebuilt only when their roster changed."""
+        cached = self._roster_fields.get(battler.user.id)
+        if cached is not None and cached[0] == battler.revision:
+            return cached[1]
+        display_balls = battler.proposal[:10]
+        more_balls = len(battler.proposal) - len(display_balls)
+        display_message = "\n".join(
+            f"- {self.bot.get_emoji(ball.emoji_id)} {ball.country} (#{ball.pk:0X})"
+            for ball in display_balls
+        )
+        if more_balls > 0:
+            display_message += f"\n...and {more_balls} more."
+        display_message = display_message or "No balls selected yet."
+        self._roster_fields[battler.user.id] = (battler.revision, display_message)
+        return display_message
+
+    def format_odds(self) -> Optional[str]:
+        """Estimated chances of both players, or None if they cannot be computed."""
+        if not ODDS_AVAILABLE or not self.battler1.proposal or not self.battler2.proposal:
+            return None
+        odds = estimate_odds(
+            [ball.stats for ball in self.battler1.proposal],
+            [ball.stats for ball in self.battler2.proposal],
+        )
+        name1 = self.battler1.user.display_name
+        name2 = self.battler2.user.display_name
+        lines = [
+            f"📈 Estimated odds: {name1} {odds.win1:.0%} • {name2} {odds.win2:.0%} • Draw {odds.draw:.0%}"
+        ]
+        for i, (win1, win2, draw) in enumerate(odds.rounds):
+            ball1 = self.battler1.proposal[i]
+            ball2 = self.battler2.proposal[i]
+            lines.append(
+                f"Round {i + 1}: {ball1.country} {win1:.0%} • {ball2.country} {win2:.0%} • Draw {draw:.0%}"
+            )
+        return "\n".join(lines)
+
     async def update_message(self):
-        self._generate_embed()
-        await self.message.edit(embed=self.embed)
+        """
+        Mark the roster embed as changed.
 
-    async def update_message_loop(self):
-        """Background task that refreshes the battle embed every 15 seconds."""
-        assert self.task
-        start_time = discord.utils.utcnow()
-        timeout_duration = timedelta(minutes=30)
-        warning_duration = timedelta(minutes=25)
-        warning_sent = False
+        The edit is sent once the debounce window is over, so a burst of roster
+        changes results in a single edit.
+        """
+        self._dirty = True
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
 
+    async def _flush_later(self):
+        await asyncio.sleep(self.UPDATE_DEBOUNCE)
         try:
-            while True:
-                current_time = discord.utils.utcnow()
-                elapsed_time = current_time - start_time
-                remaining_time = timeout_duration - elapsed_time
-
-                if not warning_sent and elapsed_time >= warning_duration:
-                    warning_sent = True
-                    warning_msg = (
-                        f"⚠️ This battle will time out in {int(remaining_time.total_seconds() / 60) + 1} minutes!\n"
-                        "Please finalize your selection."
-                    )
-                    self.embed.description = warning_msg
-                    self.embed.color = discord.Colour.orange()
-                    try:
-                        await self.message.edit(embed=self.embed)
-                    except (discord.NotFound, discord.Forbidden):
-                        pass
-
-                if elapsed_time >= timeout_duration:
-                    try:
-                        if self.battler1.locked or self.battler2.locked:
-                            winner = self.battler1.user if self.battler1.locked else self.battler2.user
-                            loser = self.battler2.user if self.battler1.locked else self.battler1.user
-                            self.embed.description = (
-                                f"⏰ The battle timed out!\n\n"
-                                f"{loser.mention} did not finish in time,\n"
-                                f"so {winner.mention} wins by default."
-                            )
-                        else:
-                            self.embed.description = (
-                                f"⏰ The battle timed out!\n\n"
-                                f"Neither player locked their roster in time,\n"
-                                "so the battle was cancelled."
-                            )
-                        self.embed.color = discord.Colour.red()
-                        await self.message.edit(embed=self.embed)
-                        await self.cancel("The battle timed out.")
-                        return
-                    except (discord.NotFound, discord.Forbidden):
-                        await self.cancel("The battle timed out but the message could not be updated.")
-                        return
+            await self.flush_message()
+        except discord.NotFound:
+            await self.cancel("The battle message has been deleted.")
+        except discord.Forbidden:
+            await self.cancel("The bot lacks permission to update the battle message.")
+        except Exception as e:
+            print(f"Failed to refresh battle message: {str(e)}")
 
-                try:
-                    await self.update_message()
-                except discord.NotFound:
-                    await self.cancel("The battle message has been deleted.")
-                    return
-                except discord.Forbidden:
-                    await self.cancel("The bot lacks permission to update the battle message.")
-                    return
-                except Exception as e:
-                    print(f"Failed to refresh battle message: {str(e)}")
-                    await asyncio.sleep(15)
-                    continue
-
-                await asyncio.sleep(15)
-        except asyncio.CancelledError:
+    async def flush_message(self):
+        """Send the roster embed now, if it changed since the last edit."""
+        if not self._dirty or not self.message:
             return
-        finally:
-            if not self.message or self.message.flags.ephemeral:
-                self.cog.remove_battle(self.channel.guild.id)
+        self._dirty = False
+        self._generate_embed()
+        await self.playback.edit(self.message, embed=self.embed)
+
+    def _discard_pending_update(self):
+        """Drop a roster edit that has not been sent yet."""
+        self._dirty = False
+        if (
+            self._flush_task
+            and not self._flush_task.done()
+            and self._flush_task is not asyncio.current_task()
+        ):
+            self._flush_task.cancel()
+
+    async def _warn_timeout(self):
+        """Warn both players that the battle is about to time out."""
+        remaining = int((BATTLE_TIMEOUT - BATTLE_WARNING) / 60)
+        self.embed.description = (
+            f"⚠️ This battle will time out in {remaining} minutes!\n"
+            "Please finalize your selection."
+        )
+        self.embed.color = discord.Colour.orange()
+        try:
+            await self.playback.edit(self.message, embed=self.embed)
+        except (discord.NotFound, discord.Forbidden):
+            pass
+
+    async def _time_out(self):
+        """End the battle once the timeout is reached."""
+        self._discard_pending_update()
+        try:
+            if self.battler1.locked or self.battler2.locked:
+                winner = self.battler1.user if self.battler1.locked else self.battler2.user
+                loser = self.battler2.user if self.battler1.locked else self.battler1.user
+                self.embed.description = (
+                    f"⏰ The battle timed out!\n\n"
+                    f"{loser.mention} did not finish in time,\n"
+                    f"so {winner.mention} wins by default."
+                )
+            else:
+                self.embed.description = (
+                    f"⏰ The battle timed out!\n\n"
+                    f"Neither player locked their roster in time,\n"
+                    "so the battle was cancelled."
+                )
+            self.embed.color = discord.Colour.red()
+            await self.playback.edit(self.message, embed=self.embed)
+            await self.cancel("The battle timed out.")
+        except (discord.NotFound, discord.Forbidden):
+            await self.cancel("The battle timed out but the message could not be updated.")
+
+    def _on_edit_error(self, error: Exception):
+        """Stop the battle once its message can no longer be edited."""
+        if not isinstance(error, (discord.NotFound, discord.Forbidden)):
+            print(f"Failed to update the battle message: {str(error)}")
+            return
+        self.is_cancelled = True
+        self.cog.runner.cancel(self)
+        self._discard_pending_update()
+        self.current_view.stop()
+        self.cog.remove_battle(self)
+
+    def stop_timers(self):
+        """Cancel the timeout warning and the timeout of this battle."""
+        for deadline in self.deadlines:
+            deadline.cancel()
+        self.deadlines.clear()
 
     async def start(self):
         """Initialize the battle message and controls."""
         try:
             self._generate_embed()
-            self.message = await self.channel.send(
-                content=f"🎮 {self.battler1.user.mention} has challenged {self.battler2.user.mention}!\n"
-                "Use `/battle add` to pick specific balls or `/battle all` for random picks.\n"
-                "Lock in your roster once you are satisfied.",
-                embed=self.embed,
-                view=self.current_view,
-                allowed_mentions=discord.AllowedMentions(users=[self.battler1.user, self.battler2.user]),
-            )
-            self.task = self.bot.loop.create_task(self.update_message_loop())
+            self.is_starting = True
+            try:
+                self.message = await self.channel.send(
+                    content=f"🎮 {self.battler1.user.mention} has challenged {self.battler2.user.mention}!\n"
+                    "Use `/battle add` to pick specific balls or `/battle all` for random picks.\n"
+                    "Lock in your roster once you are satisfied.",
+                    embed=self.embed,
+                    view=self.current_view,
+                    allowed_mentions=discord.AllowedMentions(users=[self.battler1.user, self.battler2.user]),
+                )
+            finally:
+                self.is_starting = False
+            self.playback.watch(self.message, self._on_edit_error)
+            self.deadlines = [
+                self.cog.timers.schedule(BATTLE_WARNING, self._warn_timeout),
+                self.cog.timers.schedule(BATTLE_TIMEOUT, self._time_out),
+            ]
 
             help_embed = discord.Embed(
                 title="Battle instructions",
@@ -208,12 +294,9 @@ class BattleMenu:
         """Cancel the battle immediately and disable controls."""
         try:
             self.is_cancelled = True
-            if self.task and not self.task.done():
-                self.task.cancel()
-                try:
-                    await self.task
-                except asyncio.CancelledError:
-                    pass
+            self.cog.runner.cancel(self)
+            self._discard_pending_update()
+            self.stop_timers()
 
             self.current_view.stop()
             for item in self.current_view.children:
@@ -224,268 +307,151 @@ class BattleMenu:
             
             if self.message:
                 try:
-                    await self.message.edit(content=None, embed=self.embed, view=self.current_view)
+                    await self.playback.edit(self.message, content=None, embed=self.embed, view=self.current_view)
                 except (discord.NotFound, discord.Forbidden):
                     pass
         except Exception as e:
             print(f"Failed to cancel the battle: {str(e)}")
         finally:
-            self.cog.remove_battle(self.channel.guild.id)
+            self.cog.remove_battle(self)
 
     async def commence_battle(self):
         """Run the battle simulation between both players."""
+        self._discard_pending_update()
         if not self.battler1.proposal and not self.battler2.proposal:
-            await self._display_battle_results([], None, "Both players forgot to pick a team!")
+            await self._display_battle_results(None, None, "Both players forgot to pick a team!")
             return
         if not self.battler1.proposal:
-            await self._display_battle_results([], self.battler2.user, f"{self.battler1.user.display_name} did not select any balls!")
+            await self._display_battle_results(None, self.battler2.user, f"{self.battler1.user.display_name} did not select any balls!")
             return
         if not self.battler2.proposal:
-            await self._display_battle_results([], self.battler1.user, f"{self.battler2.user.display_name} did not select any balls!")
+            await self._display_battle_results(None, self.battler1.user, f"{self.battler2.user.display_name} did not select any balls!")
             return
 
-        if self.task and not self.task.done():
-            self.task.cancel()
-            try:
-                await self.task
-            except asyncio.CancelledError:
-                pass
+        self.stop_timers()
+
+        result = simulate_battle(
+            [ball.stats for ball in self.battler1.proposal],
+            [ball.stats for ball in self.battler2.proposal],
+        )
 
         self.embed.description = "🎮 The battle begins!\n\n"
-        await self.message.edit(embed=self.embed)
-        await asyncio.sleep(2)
+        await self.playback.edit(self.message, embed=self.embed)
+        await asyncio.sleep(self.mode.delay(BATTLE_START_DELAY))
 
-        rounds = []
         battler1_wins = 0
         battler2_wins = 0
-        
-        for i in range(min(len(self.battler1.proposal), len(self.battler2.proposal))):
-            ball1 = self.battler1.proposal[i]
-            ball2 = self.battler2.proposal[i]
-            round_result = await self._battle_round(i + 1, ball1, ball2)
-            rounds.append(round_result)
-            
-            if round_result["winner"] == self.battler1.user:
+
+        for round_result in result.rounds:
+            if self.is_cancelled:
+                return
+            ball1 = self.battler1.proposal[round_result.number - 1]
+            ball2 = self.battler2.proposal[round_result.number - 1]
+            if self.mode == PlaybackMode.instant:
+                await self._record_round_stats(round_result, ball1, ball2)
+                continue
+            battle_log = await self._battle_round(round_result, ball1, ball2)
+
+            if round_result.winner == 1:
                 battler1_wins += 1
-            elif round_result["winner"] == self.battler2.user:
+            elif round_result.winner == 2:
                 battler2_wins += 1
-                
-            score_msg = (
-                f"\n\n📊 Score update:\n"
+
+            battle_log.append(
+                f"\n📊 Score update:\n"
                 f"{self.battler1.user.display_name}: {battler1_wins} wins\n"
                 f"{self.battler2.user.display_name}: {battler2_wins} wins"
             )
-            self.embed.description += score_msg
-            await self.message.edit(embed=self.embed)
-            await asyncio.sleep(4)
-
-        if battler1_wins > battler2_wins:
-            winner = self.battler1.user
-        elif battler2_wins > battler1_wins:
-            winner = self.battler2.user
-        else:
-            winner = None
-
-        await self._display_battle_results(rounds, winner)
-        self.cog.remove_battle(self.channel.guild.id)
-
-    async def _battle_round(self, round_number: int, ball1, ball2):
-        """Simulate a single battle round."""
-        result = {
-            "round": round_number,
-            "ball1": ball1,
-            "ball2": ball2,
-            "winner": None,
-            "details": []
-        }
-
-        if self.is_cancelled:
-            return result
-
-        battle_log: list[str] = []
-        round_start = f"Round {round_number} begins!\n"
-        round_start += f"⚔️ {ball1.countryball.country} (ATK:{ball1.attack} HP:{ball1.health}) vs {ball2.countryball.country} (ATK:{ball2.attack} HP:{ball2.health})"
-        battle_log.append(round_start)
-        
-        self.embed.description = "\n".join(battle_log)
-        await self.message.edit(embed=self.embed)
-        await asyncio.sleep(2)
-        
-        ball1_hp = ball1.health
-        ball2_hp = ball2.health
-        
-        first_attacker = random.choice([1, 2])
-        first_attack_msg = (
-            f"🎲 First strike: {ball1.countryball.country}"
-            if first_attacker == 1
-            else f"🎲 First strike: {ball2.countryball.country}"
+            self.embed.description = battle_log.render()
+            await self.playback.edit(self.message, embed=self.embed)
+            await asyncio.sleep(self.mode.delay(SCORE_DELAY))
+
+        await self._record_ratings(result)
+        replay_id = await self._save_replay(result)
+        if replay_id:
+            self.embed.set_footer(text=f"Watch this battle again with /battle replay {replay_id}")
+        await self._display_battle_results(result)
+
+    async def _record_ratings(self, result: BattleResult):
+        rows = self.cog.ratings.record(
+            self.battler1.user.id, self.battler2.user.id, result.winner
         )
-        battle_log.append(first_attack_msg)
-        
-        self.embed.description = "\n".join(battle_log)
-        await self.message.edit(embed=self.embed)
-        await asyncio.sleep(1.5)
-        
-        async def perform_attack(attacker, defender, attacker_hp, defender_hp):
-            base_crit_chance = 0.08
-            attack_advantage = attacker.attack / (defender.health + 1)
-            crit_chance = min(max(base_crit_chance * (1 + attack_advantage * 0.3), 0.05), 0.2)
-            
-            is_crit = random.random() < crit_chance
-            damage_multiplier = 1.3 if is_crit else 1.0
-            
-            defense_ratio = defender.health / (max(attacker.attack, 1) * 4)
-            defense_reduction = min(defense_ratio, 0.2)
-            base_damage = attacker.attack * (1 - defense_reduction)
-            
-            damage = base_damage * damage_multiplier if not is_crit else max(base_damage * damage_multiplier, attacker.attack * 1.3)
-            
-            defender_hp -= damage
-            
-            attack_emojis = {
-                "normal": ["⚔️", "🗡️", "👊", "💢", "💫"],
-                "crit": ["💥", "✨", "🌟", "🔥", "⚡"]
-            }
-            
-            attack_verbs = [
-                "deals",
-                "delivers",
-                "unleashes",
-                "strikes for",
-                "hits for",
-                "inflicts",
-                "lands",
-                "bursts for",
-                "lashes out for",
-                "smashes for",
-                "hammers for",
-                "slashes for",
-            ]
-            
-            attack_emoji = random.choice(attack_emojis["crit"] if is_crit else attack_emojis["normal"])
-            attack_msg = f"{attack_emoji} {attacker.countryball.country} "
-            
-            if is_crit:
-                attack_msg += f"crits for {damage:.0f} damage!"
-            else:
-                attack_msg += f"{random.choice(attack_verbs)} {damage:.0f} damage!"
-            
-            if defense_reduction > 0:
-                attack_msg += f" (mitigation: {defense_reduction*100:.0f}%)"
-            
-            attack_msg += f" (defender HP: {max(0, defender_hp):.0f})"
-            battle_log.append(attack_msg)
-            result["details"].append(attack_msg)
-            
-            self.embed.description = "\n".join(battle_log)
-            await self.message.edit(embed=self.embed)
-            await asyncio.sleep(1.5)
-            
-            return defender_hp
-
-        turn_count = 0
-        max_turns = 10
-
-        while ball1_hp > 0 and ball2_hp > 0:
-            turn_count += 1
-            if turn_count > max_turns:
-                draw_msg = "⚠️ Both sides are exhausted. This round ends in a draw."
-                battle_log.append(draw_msg)
-                result["details"].append(draw_msg)
-                self.embed.description = "\n".join(battle_log)
-                await self.message.edit(embed=self.embed)
-                await asyncio.sleep(2)
-                break
+        try:
+            await self.cog.store.run(self.cog.store.save_ratings, rows)
+        except Exception as e:
+            print(f"Failed to save battle ratings: {str(e)}")
+
+    async def _save_replay(self, result: BattleResult) -> Optional[int]:
+        try:
+            return await self.cog.store.run(
+                self.cog.store.save_replay,
+                encode_replay(
+                    result,
+                    (self.battler1.user.id, self.battler2.user.id),
+                    (self.battler1.proposal, self.battler2.proposal),
+                )
+            )
+        except Exception as e:
+            print(f"Failed to save battle replay: {str(e)}")
+            return None
+
+    async def _battle_round(
+        self, round_result: RoundResult, ball1: BallSnapshot, ball2: BallSnapshot
+    ) -> LogBuffer:
+        """Play back a single round from the engine's event log."""
+        battle_log = LogBuffer()
+        countries = (ball1.country, ball2.country)
+        players = (self.battler1.user.display_name, self.battler2.user.display_name)
+
+        for event in round_result.events:
             if self.is_cancelled:
-                return result
-
-            if first_attacker == 1:
-                ball2_hp = await perform_attack(ball1, ball2, ball1_hp, ball2_hp)
-                if ball2_hp <= 0:
-                    defeat_msg = f"💀 {ball2.countryball.country} is down!"
-                    battle_log.append(defeat_msg)
-                    result["details"].append(defeat_msg)
-                    result["winner"] = self.battler1.user
-                    self.embed.description = "\n".join(battle_log)
-                    await self.message.edit(embed=self.embed)
-                    await asyncio.sleep(2)
-                    break
-                
-                if self.is_cancelled:
-                    return result
-                
-                ball1_hp = await perform_attack(ball2, ball1, ball2_hp, ball1_hp)
-                if ball1_hp <= 0:
-                    defeat_msg = f"💀 {ball1.countryball.country} is down!"
-                    battle_log.append(defeat_msg)
-                    result["details"].append(defeat_msg)
-                    result["winner"] = self.battler2.user
-                    self.embed.description = "\n".join(battle_log)
-                    await self.message.edit(embed=self.embed)
-                    await asyncio.sleep(2)
-                    break
-            else:
-                ball1_hp = await perform_attack(ball2, ball1, ball2_hp, ball1_hp)
-                if ball1_hp <= 0:
-                    defeat_msg = f"💀 {ball1.countryball.country} is down!"
-                    battle_log.append(defeat_msg)
-                    result["details"].append(defeat_msg)
-                    result["winner"] = self.battler2.user
-                    self.embed.description = "\n".join(battle_log)
-                    await self.message.edit(embed=self.embed)
-                    await asyncio.sleep(2)
-                    break
-                
-                if self.is_cancelled:
-                    return result
-                
-                ball2_hp = await perform_attack(ball1, ball2, ball1_hp, ball2_hp)
-                if ball2_hp <= 0:
-                    defeat_msg = f"💀 {ball2.countryball.country} is down!"
-                    battle_log.append(defeat_msg)
-                    result["details"].append(defeat_msg)
-                    result["winner"] = self.battler1.user
-                    self.embed.description = "\n".join(battle_log)
-                    await self.message.edit(embed=self.embed)
-                    await asyncio.sleep(2)
-                    break
-
-        if result["winner"] and not self.is_cancelled:
-            victory_emojis = ["🏆", "👑", "🏅", "✨", "🌟", "💫", "🎉", "🎊"]
-            victory_phrases = [
-                "wins the round!",
-                "secures the victory!",
-                "dominates this duel!",
-                "controls the battlefield!",
-                "outplays the opponent!",
-                "emerges triumphant!",
-            ]
-            battle_log.append(f"\n{random.choice(victory_emojis)} {result['winner'].display_name} {random.choice(victory_phrases)}")
-            self.embed.description = "\n".join(battle_log)
-            await self.message.edit(embed=self.embed)
-            await asyncio.sleep(2)
+                break
+            battle_log.append(render_event(event, round_result, countries, players))
+            self.embed.description = battle_log.render()
+            self.playback.submit(self.message, embed=self.embed)
+            await asyncio.sleep(self.mode.delay(EVENT_DELAYS[event.code]))
+        else:
+            await self._record_round_stats(round_result, ball1, ball2)
+        return battle_log
 
-        return result
+    async def _record_round_stats(
+        self, round_result: RoundResult, ball1: BallSnapshot, ball2: BallSnapshot
+    ):
+        stats1, stats2 = round_stats(round_result)
+        try:
+            await self.cog.store.run(
+                self.cog.store.add_stats,
+                [(ball1.ball_id, stats1), (ball2.ball_id, stats2)],
+                [(ball1.pk, stats1), (ball2.pk, stats2)],
+            )
+        except Exception as e:
+            print(f"Failed to save battle statistics: {str(e)}")
 
-    async def _display_battle_results(self, rounds: List[dict], winner: Optional[discord.User], custom_message: str = None):
+    async def _display_battle_results(
+        self,
+        result: Optional[BattleResult],
+        winner: Optional[discord.User] = None,
+        custom_message: str = None,
+    ):
         """Display the final outcome of the battle."""
         try:
             if custom_message:
                 self.embed.description = custom_message
             else:
+                if result.winner:
+                    winner = self.battler1.user if result.winner == 1 else self.battler2.user
                 description = "🏆 The battle is over!\n\n"
-                
-                total_rounds = len(rounds)
+
+                total_rounds = len(result.rounds)
                 if total_rounds > 0:
                     description += f"{total_rounds} rounds were played.\n\n"
-                    
-                    battler1_wins = sum(1 for r in rounds if r["winner"] == self.battler1.user)
-                    battler2_wins = sum(1 for r in rounds if r["winner"] == self.battler2.user)
-                    
+
+                    battler1_wins, battler2_wins = result.wins
+
                     description += "📊 Scoreboard:\n"
                     description += f"{self.battler1.user.display_name}: {battler1_wins} wins\n"
                     description += f"{self.battler2.user.display_name}: {battler2_wins} wins\n\n"
-                    
+
                     if winner:
                         winner_wins = battler1_wins if winner == self.battler1.user else battler2_wins
                         victory_phrases = [
@@ -514,7 +480,7 @@ class BattleMenu:
             self.embed.color = discord.Colour.green() if winner else discord.Colour.orange()
                 
             try:
-                await self.message.edit(embed=self.embed, view=None)
+                await self.playback.edit(self.message, embed=self.embed, view=None)
             except discord.NotFound:
                 print("Battle result message was deleted.")
             except discord.Forbidden:
@@ -527,9 +493,164 @@ class BattleMenu:
             try:
                 self.embed.description = "🏆 The battle has ended."
                 self.embed.color = discord.Colour.orange()
-                await self.message.edit(embed=self.embed, view=None)
+                await self.playback.edit(self.message, embed=self.embed, view=None)
             except Exception:
                 pass
+        finally:
+            self.cog.remove_battle(self)
+
+
+class RaidMenu:
+    """
+    A server-wide raid: players commit one ball each during the join window,
+    then the fight is resolved tick by tick with one message edit per tick.
+    """
+
+    def __init__(
+        self,
+        cog: "Battle",
+        interaction: discord.Interaction["BallsDexBot"],
+        boss: Ball,
+        mode: PlaybackMode = PlaybackMode.cinematic,
+    ):
+        self.cog = cog
+        self.playback = cog.playback
+        self.mode = mode
+        self.bot = interaction.client
+        self.channel: discord.TextChannel = interaction.channel
+        self.host = interaction.user
+        self.boss = boss
+        self.attackers: Dict[int, Tuple[discord.User | discord.Member, BallSnapshot]] = {}
+        self.embed = discord.Embed()
+        self.message: Optional[discord.Message] = None
+        self.deadline: Optional[Deadline] = None
+        self.started = False
+        self.is_cancelled = False
+
+    @property
+    def boss_name(self) -> str:
+        return f"{self.bot.get_emoji(self.boss.emoji_id) or ''} {self.boss.country}".strip()
+
+    def _lobby_embed(self):
+        self.embed.title = f"Raid: {self.boss_name}"
+        self.embed.color = discord.Colour.dark_red()
+        self.embed.description = (
+            f"{self.host.mention} summoned a raid boss!\n"
+            "Join with `/battle raid join` and the ball you want to send.\n\n"
+            f"The raid begins <t:{int(time.time()) + RAID_JOIN_WINDOW}:R>."
+        )
+        self.embed.clear_fields()
+        self.embed.add_field(name="Attackers", value=str(len(self.attackers)))
+
+    async def start(self):
+        self._lobby_embed()
+        self.message = await self.channel.send(embed=self.embed)
+        self.playback.watch(self.message, self._on_edit_error)
+        self.deadline = self.cog.timers.schedule(RAID_JOIN_WINDOW, self.fight)
+
+    def join(self, user: discord.User | discord.Member, ball: BallInstance) -> bool:
+        """Commit a ball, replacing the one previously sent by this user."""
+        if self.started:
+            return False
+        self.attackers[user.id] = (user, BallSnapshot.from_instance(ball))
+        self.embed.set_field_at(0, name="Attackers", value=str(len(self.attackers)))
+        if self.message:
+            self.playback.submit(self.message, embed=self.embed)
+        return True
+
+    def _on_edit_error(self, error: Exception):
+        """Stop the raid once its message can no longer be edited."""
+        if not isinstance(error, (discord.NotFound, discord.Forbidden)):
+            print(f"Failed to update the raid message: {str(error)}")
+            return
+        self.started = True
+        self.is_cancelled = True
+        if self.deadline:
+            self.deadline.cancel()
+        self.cog.remove_raid(self)
+
+    async def cancel(self, reason: str = "The raid was cancelled."):
+        self.started = True
+        if self.deadline:
+            self.deadline.cancel()
+        self.embed.description = f"**{reason}**"
+        self.embed.color = discord.Colour.red()
+        try:
+            await self.playback.edit(self.message, embed=self.embed)
+        except (discord.NotFound, discord.Forbidden):
+            pass
+        finally:
+            self.cog.remove_raid(self)
+
+    async def fight(self):
+        """Resolve the raid and play it back, one aggregated edit per tick."""
+        self.started = True
+        try:
+            if not self.attackers:
+                await self.cancel("Nobody answered the call, the boss left.")
+                return
+            users = [user for user, _ in self.attackers.values()]
+            snapshots = [ball for _, ball in self.attackers.values()]
+            raid = Raid((self.boss.attack, self.boss.health), [ball.stats for ball in snapshots])
+
+            while not raid.is_over and not self.is_cancelled:
+                tick = raid.tick()
+                self._tick_embed(raid, tick, users, snapshots)
+                self.playback.submit(self.message, embed=self.embed)
+                await asyncio.sleep(self.mode.delay(RAID_TICK_DELAY))
+
+            if self.is_cancelled:
+                return
+            self._result_embed(raid, users, snapshots)
+            await self.playback.edit(self.message, embed=self.embed)
+        except Exception as e:
+            print(f"Raid playback failed: {str(e)}")
+        finally:
+            self.cog.remove_raid(self)
+
+    def _health_bar(self, raid: Raid, width: int = 20) -> str:
+        filled = math.ceil(width * raid.boss_hp / raid.boss_health) if raid.boss_hp > 0 else 0
+        return f"`{'█' * filled}{'░' * (width - filled)}` {max(raid.boss_hp, 0):,.0f} / {raid.boss_health:,.0f}"
+
+    def _top_damage(self, raid: Raid, users, snapshots, limit: int = 5) -> str:
+        return "\n".join(
+            f"{position}. {users[i].display_name} ({snapshots[i].country}): {raid.dealt[i]:,.0f}"
+            for position, i in enumerate(raid.top_attackers(limit), 1)
+        )
+
+    def _tick_embed(self, raid: Raid, tick: Tick, users, snapshots):
+        self.embed.description = (
+            f"**Tick {tick.number}**\n"
+            f"{raid.standing} attackers dealt {tick.damage:,.0f} damage"
+            + (f" with {tick.crits} critical hits" if tick.crits else "")
+            + ".\n"
+        )
+        if tick.knocked_out:
+            names = ", ".join(snapshots[i].country for i in tick.knocked_out[:10])
+            more = len(tick.knocked_out) - 10
+            self.embed.description += f"💥 The boss knocked out {names}" + (
+                f" and {more} more" if more > 0 else ""
+            ) + ".\n"
+        self.embed.description += f"\n{self._health_bar(raid)}"
+        self.embed.clear_fields()
+        self.embed.add_field(name="Top damage", value=self._top_damage(raid, users, snapshots))
+
+    def _result_embed(self, raid: Raid, users, snapshots):
+        if raid.victory:
+            self.embed.description = f"🏆 {self.boss_name} was defeated in {raid.ticks} ticks!"
+            self.embed.color = discord.Colour.green()
+        elif raid.standing == 0:
+            self.embed.description = f"☠️ {self.boss_name} wiped out every attacker."
+            self.embed.color = discord.Colour.dark_grey()
+        else:
+            self.embed.description = (
+                f"⌛ {self.boss_name} escaped with "
+                f"{raid.boss_hp / raid.boss_health:.0%} of its health left."
+            )
+            self.embed.color = discord.Colour.orange()
+        self.embed.description += f"\n\n{self._health_bar(raid)}"
+        self.embed.clear_fields()
+        self.embed.add_field(name="Top damage", value=self._top_damage(raid, users, snapshots))
 
 
 class BattleView(View):
@@ -565,11 +686,14 @@ class BattleView(View):
         battler.locked = True
         await self.battle.update_message()
         if self.battle.battler1.locked and self.battle.battler2.locked:
-            await interaction.followup.send(
-                "Both players are locked in. The battle will begin shortly!",
-                ephemeral=True,
-            )
-            await self.battle.commence_battle()
+            message = "Both players are locked in. The battle will begin shortly!"
+            odds = self.battle.format_odds()
+            if odds:
+                message += f"\n\n{odds}"
+            if self.battle.cog.runner.is_busy:
+                message += "\n\nMany battles are being played right now, yours will start in a moment."
+            await interaction.followup.send(message, ephemeral=True)
+            self.battle.cog.runner.submit(self.battle)
         else:
             await interaction.followup.send(
                 "Your selection is now locked. Waiting for your opponent.",
@@ -641,7 +765,7 @@ class BattleView(View):
             )
             return
 
-        if ball in battler.proposal:
+        if battler.has_ball(ball.pk):
             await interaction.response.send_message(
                 "This ball is already in your roster.", ephemeral=True
             )
@@ -653,8 +777,7 @@ class BattleView(View):
             )
             return
 
-        battler.proposal.append(ball)
-        battler.proposal = battler.proposal[:battle.MAX_BALLS]
+        battler.add_ball(ball)
         await interaction.response.send_message(
             f"{ball.countryball.country} joined your roster.", ephemeral=True
         )
@@ -690,7 +813,7 @@ class BattleView(View):
             await interaction.response.send_message("You do not own any usable balls.", ephemeral=True)
             return
 
-        available_balls = [ball for ball in all_balls if ball not in battler.proposal]
+        available_balls = [ball for ball in all_balls if not battler.has_ball(ball.pk)]
 
         remaining_slots = battle.MAX_BALLS - len(battler.proposal)
         if remaining_slots <= 0:
@@ -700,8 +823,7 @@ class BattleView(View):
             return
 
         balls_to_add = available_balls[:remaining_slots]
-        battler.proposal.extend(balls_to_add)
-        battler.proposal = battler.proposal[:battle.MAX_BALLS]
+        battler.add_balls(balls_to_add)
 
         if not balls_to_add:
             await interaction.response.send_message("Every ball you own is already in your roster.", ephemeral=True)
@@ -719,9 +841,129 @@ class BattleView(View):
         await battle.update_message()
 
 
-class CountryballsSource(menus.ListPageSource):
-    def __init__(self, entries: List[BallInstance]):
-        super().__init__(entries, per_page=25)
+class ReplaySource(menus.ListPageSource):
+    def __init__(self, bot: "BallsDexBot", replay_id: int, replay: Replay):
+        super().__init__(replay.result.rounds, per_page=1)
+        self.bot = bot
+        self.replay_id = replay_id
+        self.replay = replay
+
+    def _player_name(self, user_id: int) -> str:
+        user = self.bot.get_user(user_id)
+        return user.display_name if user else f"<@{user_id}>"
+
+    @staticmethod
+    def _country(ball_id: int) -> str:
+        ball = balls.get(ball_id)
+        return ball.country if ball else "Unknown"
+
+    async def format_page(self, menu: Pages, round_result: RoundResult):
+        players = tuple(self._player_name(user_id) for user_id in self.replay.players)
+        ball1 = self.replay.rosters[0][round_result.number - 1]
+        ball2 = self.replay.rosters[1][round_result.number - 1]
+        countries = (self._country(ball1.ball_id), self._country(ball2.ball_id))
+        battle_log = LogBuffer()
+        for event in round_result.events:
+            battle_log.append(render_event(event, round_result, countries, players))
+        embed = discord.Embed(
+            title=f"Battle replay #{self.replay_id}",
+            description=battle_log.render(),
+            color=discord.Colour.blurple(),
+        )
+        wins1, wins2 = self.replay.result.wins
+        embed.set_footer(text=f"Final score: {players[0]} {wins1} - {wins2} {players[1]}")
+        return embed
+
+
+class LeaderboardSource(menus.ListPageSource):
+    def __init__(self, bot: "BallsDexBot", rows: List[RatingRow], per_page: int = 10):
+        super().__init__(rows, per_page=per_page)
+        self.bot = bot
+
+    async def format_page(self, menu: Pages, rows: List[RatingRow]):
+        start = menu.current_page * self.per_page
+        lines = []
+        for position, (discord_id, rating, wins, losses, draws) in enumerate(rows, start + 1):
+            user = self.bot.get_user(discord_id)
+            name = user.display_name if user else f"<@{discord_id}>"
+            lines.append(f"**{position}.** {name} - {rating:.0f} ({wins}W {losses}L {draws}D)")
+        return discord.Embed(
+            title="Battle leaderboard",
+            description="\n".join(lines),
+            color=discord.Colour.gold(),
+        )
+
+
+class CountryballsSource(menus.PageSource):
+    """
+    Page source that only fetches the page being displayed.
+
+    When the sort is a plain column, pages are read with keyset pagination on
+    (sort column, id) starting from the last row of the previous page. Computed
+    sorts, and jumps to a page whose previous page was never loaded, use OFFSET.
+    """
+
+    def __init__(
+        self,
+        queryset: QuerySet[BallInstance],
+        sort: Optional[SortingChoices] = None,
+        per_page: int = 25,
+    ):
+        self.queryset = queryset
+        self.sort = sort
+        self.per_page = per_page
+        self.count: Optional[int] = None
+        self.keyset_field: Optional[str] = "id"
+        self.descending = False
+        if sort is not None:
+            field = sort.value.lstrip("-")
+            if field in BallInstance._meta.db_fields:
+                self.keyset_field = field
+                self.descending = sort.value.startswith("-")
+            else:
+                self.keyset_field = None
+        # page number -> (sort value, id) of the last ball on that page
+        self.boundaries: Dict[int, Tuple[Any, int]] = {}
+
+    async def prepare(self):
+        if self.count is None:
+            self.count = await self.queryset.count()
+
+    def is_paginating(self) -> bool:
+        return (self.count or 0) > self.per_page
+
+    def get_max_pages(self) -> int:
+        return max(1, math.ceil((self.count or 0) / self.per_page))
+
+    def _ordered(self) -> QuerySet[BallInstance]:
+        if self.keyset_field is None:
+            return sort_balls(self.sort, self.queryset)
+        prefix = "-" if self.descending else ""
+        if self.keyset_field == "id":
+            return self.queryset.order_by(f"{prefix}id")
+        return self.queryset.order_by(f"{prefix}{self.keyset_field}", f"{prefix}id")
+
+    def _after(self, boundary: Tuple[Any, int]) -> Q:
+        value, pk = boundary
+        lookup = "lt" if self.descending else "gt"
+        if self.keyset_field == "id":
+            return Q(**{f"id__{lookup}": pk})
+        return Q(**{f"{self.keyset_field}__{lookup}": value}) | Q(
+            **{self.keyset_field: value, f"id__{lookup}": pk}
+        )
+
+    async def get_page(self, page_number: int) -> List[BallInstance]:
+        query = self._ordered()
+        boundary = self.boundaries.get(page_number - 1)
+        if self.keyset_field is not None and boundary is not None:
+            query = query.filter(self._after(boundary))
+        elif page_number > 0:
+            query = query.offset(page_number * self.per_page)
+        balls = await query.limit(self.per_page)
+        if self.keyset_field is not None and balls:
+            last = balls[-1]
+            self.boundaries[page_number] = (getattr(last, self.keyset_field), last.pk)
+        return balls
 
     async def format_page(self, menu: "CountryballsSelector", balls: List[BallInstance]):
         menu.set_options(balls)
@@ -732,23 +974,38 @@ class CountryballsSelector(Pages):
     def __init__(
         self,
         interaction: discord.Interaction["BallsDexBot"],
-        balls: List[BallInstance],
+        source: CountryballsSource,
         cog: "BattleCog",
     ):
         self.bot = interaction.client
         self.interaction = interaction
-        source = CountryballsSource(balls)
         super().__init__(source, interaction=interaction)
         self.add_item(self.select_ball_menu)
         self.add_item(self.confirm_button)
         self.add_item(self.select_all_button)
         self.add_item(self.clear_button)
         self.balls_selected: Set[BallInstance] = set()
+        self.loaded_balls: Dict[int, BallInstance] = {}
         self.cog = cog
 
+    async def resolve_balls(self, values: Iterable[str]) -> List[BallInstance]:
+        """
+        Turn selected option values into ball instances.
+
+        Balls shown on a page are reused as is, anything else is fetched with a
+        single query.
+        """
+        ids = [int(value) for value in values]
+        missing = [pk for pk in ids if pk not in self.loaded_balls]
+        if missing:
+            for ball in await BallInstance.filter(id__in=missing).prefetch_related("ball", "player"):
+                self.loaded_balls[ball.pk] = ball
+        return [self.loaded_balls[pk] for pk in ids if pk in self.loaded_balls]
+
     def set_options(self, balls: List[BallInstance]):
         options: List[discord.SelectOption] = []
         for ball in balls:
+            self.loaded_balls[ball.pk] = ball
             emoji = self.bot.get_emoji(int(ball.countryball.emoji_id))
             favorite = f"{settings.favorited_collectible_emoji} " if ball.favorite else ""
             special = ball.special_emoji(self.bot, True)
@@ -768,11 +1025,7 @@ class CountryballsSelector(Pages):
     async def select_ball_menu(
         self, interaction: discord.Interaction["BallsDexBot"], item: discord.ui.Select
     ):
-        for value in item.values:
-            ball_instance = await BallInstance.get(id=int(value)).prefetch_related(
-                "ball", "player"
-            )
-            self.balls_selected.add(ball_instance)
+        self.balls_selected.update(await self.resolve_balls(item.values))
         await interaction.response.defer()
 
     @discord.ui.button(label="Select page", style=discord.ButtonStyle.secondary)
@@ -780,12 +1033,9 @@ class CountryballsSelector(Pages):
         self, interaction: discord.Interaction["BallsDexBot"], button: Button
     ):
         await interaction.response.defer(thinking=True, ephemeral=True)
-        for ball in self.select_ball_menu.options:
-            ball_instance = await BallInstance.get(id=int(ball.value)).prefetch_related(
-                "ball", "player"
-            )
-            if ball_instance not in self.balls_selected:
-                self.balls_selected.add(ball_instance)
+        self.balls_selected.update(
+            await self.resolve_balls(option.value for option in self.select_ball_menu.options)
+        )
         await interaction.followup.send(
             (
                 f"All {settings.plural_collectible_name} on this page were selected.\n"
@@ -813,7 +1063,7 @@ class CountryballsSelector(Pages):
             await interaction.followup.send("Your selection is locked and cannot be updated.", ephemeral=True)
             return
 
-        if any(ball in battler.proposal for ball in self.balls_selected):
+        if any(battler.has_ball(ball.pk) for ball in self.balls_selected):
             await interaction.followup.send(
                 f"Some of these {settings.plural_collectible_name} are already in your roster.",
                 ephemeral=True,
@@ -834,8 +1084,7 @@ class CountryballsSelector(Pages):
             )
             return
 
-        for ball in self.balls_selected:
-            battler.proposal.append(ball)
+        battler.add_balls(self.balls_selected)
 
         grammar = (
             f"{settings.collectible_name}"
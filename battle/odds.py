@@ -0,0 +1,92 @@
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, /battle odds is disabled without it
+    np = None
+
+from ballsdex.packages.battle.engine import (
+    BASE_CRIT_CHANCE,
+    CRIT_ADVANTAGE_SCALE,
+    CRIT_MULTIPLIER,
+    MAX_CRIT_CHANCE,
+    MAX_MITIGATION,
+    MAX_TURNS,
+    MIN_CRIT_CHANCE,
+    Stats,
+)
+
+ODDS_AVAILABLE = np is not None
+DEFAULT_SAMPLES = 4096
+
+
+class Odds(NamedTuple):
+    # one (win1, win2, draw) triple per round, in roster order
+    rounds: Sequence[Tuple[float, float, float]]
+    win1: float
+    win2: float
+    draw: float
+
+
+def damage_table(attack, health):
+    """Crit chance, normal damage and crit damage of `attack` hitting `health`."""
+    crit = np.clip(
+        BASE_CRIT_CHANCE * (1 + attack / (health + 1) * CRIT_ADVANTAGE_SCALE),
+        MIN_CRIT_CHANCE,
+        MAX_CRIT_CHANCE,
+    )
+    base = attack * (1 - np.minimum(health / (np.maximum(attack, 1) * 4), MAX_MITIGATION))
+    return crit, base, np.maximum(base * CRIT_MULTIPLIER, attack * CRIT_MULTIPLIER)
+
+
+def estimate_odds(
+    roster1: Sequence[Stats],
+    roster2: Sequence[Stats],
+    samples: int = DEFAULT_SAMPLES,
+    seed: Optional[int] = None,
+) -> Odds:
+    """
+    Monte Carlo estimate of the battle outcome, using the engine's damage model.
+
+    Every round of every sampled battle is simulated at once: the state is a
+    (rounds, samples) array and each turn is a handful of array operations.
+    """
+    if np is None:
+        raise RuntimeError("numpy is required to estimate battle odds.")
+    n = min(len(roster1), len(roster2))
+    if n == 0:
+        return Odds([], 0.0, 0.0, 1.0)
+    rng = np.random.default_rng(seed)
+    stats1 = np.asarray(roster1[:n], dtype=np.float64)
+    stats2 = np.asarray(roster2[:n], dtype=np.float64)
+    attack1, health1 = stats1[:, 0:1], stats1[:, 1:2]
+    attack2, health2 = stats2[:, 0:1], stats2[:, 1:2]
+    crit12, base12, critdmg12 = damage_table(attack1, health2)
+    crit21, base21, critdmg21 = damage_table(attack2, health1)
+
+    hp1 = np.repeat(health1, samples, axis=1)
+    hp2 = np.repeat(health2, samples, axis=1)
+    first1 = rng.random((n, samples)) < 0.5
+
+    for _ in range(MAX_TURNS):
+        for opening in (True, False):
+            alive = (hp1 > 0) & (hp2 > 0)
+            if not alive.any():
+                break
+            hits2 = alive & (first1 == opening)
+            hits1 = alive & (first1 != opening)
+            rolls = rng.random((n, samples))
+            hp2 -= np.where(hits2, np.where(rolls < crit12, critdmg12, base12), 0)
+            hp1 -= np.where(hits1, np.where(rolls < crit21, critdmg21, base21), 0)
+
+    won1 = hp2 <= 0
+    won2 = hp1 <= 0
+    wins1 = won1.sum(axis=0)
+    wins2 = won2.sum(axis=0)
+    rounds = [
+        (float(w1), float(w2), float(1 - w1 - w2))
+        for w1, w2 in zip(won1.mean(axis=1), won2.mean(axis=1))
+    ]
+    win1 = float((wins1 > wins2).mean())
+    win2 = float((wins2 > wins1).mean())
+    return Odds(rounds, win1, win2, 1 - win1 - win2)
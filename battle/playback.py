@@ -0,0 +1,280 @@
+import asyncio
+import enum
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+
+import discord
+
+from ballsdex.packages.battle.engine import (
+    ATTACK,
+    CRIT,
+    DRAW,
+    FIRST_STRIKE,
+    KNOCKOUT,
+    ROUND_START,
+    ROUND_WIN,
+)
+
+if TYPE_CHECKING:
+    from ballsdex.packages.battle.menu import BattleMenu
+
+# Seconds to wait after showing each kind of event in cinematic mode.
+EVENT_DELAYS = {
+    ROUND_START: 2,
+    FIRST_STRIKE: 1.5,
+    ATTACK: 1.5,
+    CRIT: 1.5,
+    KNOCKOUT: 2,
+    DRAW: 2,
+    ROUND_WIN: 2,
+}
+BATTLE_START_DELAY = 2
+SCORE_DELAY = 4
+
+# Discord allows roughly five message edits per five seconds in a channel, and
+# 50 requests per second for the whole bot. Stay below both.
+CHANNEL_EDITS_PER_SECOND = 1.0
+CHANNEL_EDIT_BURST = 5
+GLOBAL_EDITS_PER_SECOND = 25.0
+GLOBAL_EDIT_BURST = 25
+
+# Battles played back at once; the others wait in line. A cinematic battle edits
+# its message about once per second, so this keeps within the global edit budget.
+MAX_ACTIVE_PLAYBACKS = 20
+
+
+class PlaybackMode(enum.Enum):
+    instant = "instant"
+    fast = "fast"
+    cinematic = "cinematic"
+
+    @property
+    def pace(self) -> float:
+        """Multiplier applied to every playback delay."""
+        return {"instant": 0.0, "fast": 0.25, "cinematic": 1.0}[self.value]
+
+    def delay(self, seconds: float) -> float:
+        return seconds * self.pace
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available, 0 if one is available now."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self._refill()
+        self.tokens -= 1
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class PlaybackScheduler:
+    """
+    Owns every battle message edit.
+
+    Edits are queued per message and sent as soon as both the channel and the
+    global budget allow it. When an edit is still waiting for budget and a newer
+    one arrives for the same message, they are merged and only the latest state
+    is sent, so several log lines end up in a single edit.
+
+    Nobody awaits most edits, so failures are reported to the error handler
+    registered with `watch` for that message.
+    """
+
+    def __init__(
+        self,
+        channel_rate: float = CHANNEL_EDITS_PER_SECOND,
+        channel_burst: int = CHANNEL_EDIT_BURST,
+        global_rate: float = GLOBAL_EDITS_PER_SECOND,
+        global_burst: int = GLOBAL_EDIT_BURST,
+    ):
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.channel_buckets: Dict[int, TokenBucket] = {}
+        # message id -> (message, merged fields, future resolved once they are sent)
+        self._pending: Dict[int, Tuple[discord.Message, Dict[str, Any], asyncio.Future]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._error_handlers: Dict[int, Callable[[Exception], Any]] = {}
+
+    def _channel_bucket(self, channel_id: int) -> TokenBucket:
+        bucket = self.channel_buckets.get(channel_id)
+        if bucket is None:
+            # A bucket that refilled completely is the same as a new one, drop those.
+            for idle_id in [id for id, idle in self.channel_buckets.items() if idle.is_full()]:
+                del self.channel_buckets[idle_id]
+            bucket = TokenBucket(self.channel_rate, self.channel_burst)
+            self.channel_buckets[channel_id] = bucket
+        return bucket
+
+    def watch(self, message: discord.Message, on_error: Callable[[Exception], Any]):
+        """Call `on_error` with the exception whenever an edit of this message fails."""
+        self._error_handlers[message.id] = on_error
+
+    def submit(self, message: discord.Message, **fields: Any) -> asyncio.Future:
+        """
+        Queue an edit without waiting for it.
+
+        Fields of an edit that has not been sent yet are merged with the new ones.
+        Returns a future resolved once this edit has been sent.
+        """
+        queued = self._pending.get(message.id)
+        if queued:
+            fields = {**queued[1], **fields}
+            future = queued[2]
+        else:
+            future = asyncio.get_running_loop().create_future()
+            future.add_done_callback(lambda future: self._edit_done(message.id, future))
+        self._pending[message.id] = (message, fields, future)
+        worker = self._workers.get(message.id)
+        if worker is None or worker.done():
+            worker = asyncio.create_task(self._drain(message.id))
+            self._workers[message.id] = worker
+        return future
+
+    async def edit(self, message: discord.Message, **fields: Any):
+        """Queue an edit and wait until it has been sent."""
+        await asyncio.shield(self.submit(message, **fields))
+
+    def discard(self, message: Optional[discord.Message]):
+        """Drop any edit queued for this message and stop watching it."""
+        if message:
+            self._error_handlers.pop(message.id, None)
+            queued = self._pending.pop(message.id, None)
+            if queued and not queued[2].done():
+                queued[2].set_result(None)
+
+    def _edit_done(self, message_id: int, future: asyncio.Future):
+        if future.cancelled() or future.exception() is None:
+            return
+        error = future.exception()
+        handler = self._error_handlers.get(message_id)
+        if handler is None:
+            print(f"Failed to edit battle message {message_id}: {str(error)}")
+            return
+        try:
+            result = handler(error)
+            if asyncio.iscoroutine(result):
+                asyncio.ensure_future(result)
+        except Exception as e:
+            print(f"Battle message error handler failed: {str(e)}")
+
+    async def _drain(self, message_id: int):
+        try:
+            while message_id in self._pending:
+                message = self._pending[message_id][0]
+                channel_bucket = self._channel_bucket(message.channel.id)
+                while True:
+                    delay = max(channel_bucket.wait_time(), self.global_bucket.wait_time())
+                    if delay <= 0:
+                        break
+                    await asyncio.sleep(delay)
+                if message_id not in self._pending:
+                    return
+                channel_bucket.consume()
+                self.global_bucket.consume()
+                message, fields, future = self._pending.pop(message_id)
+                try:
+                    await message.edit(**fields)
+                except asyncio.CancelledError:
+                    future.cancel()
+                    raise
+                except Exception as e:
+                    # only this edit failed, newer ones are still sent
+                    future.set_exception(e)
+                else:
+                    future.set_result(None)
+        finally:
+            if self._workers.get(message_id) is asyncio.current_task():
+                del self._workers[message_id]
+            queued = self._pending.get(message_id)
+            if queued and (message_id not in self._workers):
+                # the worker was cancelled with an edit still queued
+                self._pending.pop(message_id)
+                queued[2].cancel()
+
+
+class PlaybackRunner:
+    """
+    Plays back locked battles in the background.
+
+    At most `max_active` battles are played back at once and the others wait
+    for a slot in lock order, so the interaction that locked the battle is
+    answered immediately and a burst of locks cannot flood the event loop.
+    """
+
+    def __init__(self, max_active: int = MAX_ACTIVE_PLAYBACKS):
+        self.max_active = max_active
+        self._slots = asyncio.Semaphore(max_active)
+        self._tasks: Dict["BattleMenu", asyncio.Task] = {}
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    @property
+    def is_busy(self) -> bool:
+        """True if a new battle would have to wait for a slot."""
+        return self.active + self.queued >= self.max_active
+
+    def submit(self, battle: "BattleMenu") -> asyncio.Task:
+        """Schedule the playback of a battle, once."""
+        task = self._tasks.get(battle)
+        if task is None:
+            task = asyncio.create_task(self._run(battle))
+            self._tasks[battle] = task
+        return task
+
+    def cancel(self, battle: "BattleMenu"):
+        """Stop the playback of a battle, whether it is waiting or running."""
+        task = self._tasks.get(battle)
+        if task and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+
+    def close(self):
+        for task in self._tasks.values():
+            task.cancel()
+
+    async def _run(self, battle: "BattleMenu"):
+        self.queued += 1
+        try:
+            try:
+                await self._slots.acquire()
+            finally:
+                self.queued -= 1
+            self.active += 1
+            try:
+                await battle.commence_battle()
+                self.completed += 1
+            finally:
+                self.active -= 1
+                self._slots.release()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"Battle playback failed: {str(e)}")
+            await battle.cancel("The battle was interrupted by an error.")
+        finally:
+            del self._tasks[battle]
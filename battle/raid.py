@@ -0,0 +1,102 @@
+from typing import List, NamedTuple, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, raids are disabled without it
+    np = None
+
+from ballsdex.packages.battle.engine import Stats
+from ballsdex.packages.battle.odds import damage_table
+
+RAID_AVAILABLE = np is not None
+RAID_JOIN_WINDOW = 2 * 60
+RAID_TICK_DELAY = 3
+RAID_MAX_TICKS = 20
+# The boss health is set so that the raid would last this many ticks if every
+# attacker survived and hit for its average damage.
+RAID_TARGET_TICKS = 8
+# One boss hit per this many attackers still standing, each tick.
+RAID_ATTACKERS_PER_BOSS_HIT = 5
+
+
+class Tick(NamedTuple):
+    number: int
+    damage: float  # dealt to the boss this tick
+    crits: int
+    boss_hp: float
+    knocked_out: List[int]  # attacker indexes
+
+
+class Raid:
+    """
+    Many attackers against one boss, resolved one tick at a time.
+
+    Every tick, all attackers still standing hit the boss at once and the boss
+    strikes back at a few of them, using the same crit and mitigation rules as
+    regular battles. Each step is a handful of array operations whatever the
+    number of attackers.
+    """
+
+    def __init__(self, boss: Stats, attackers: Sequence[Stats], seed: Optional[int] = None):
+        if np is None:
+            raise RuntimeError("numpy is required to run raids.")
+        self.rng = np.random.default_rng(seed)
+        stats = np.asarray(attackers, dtype=np.float64).reshape(-1, 2)
+        self.attack = stats[:, 0]
+        self.health = stats[:, 1]
+        self.hp = self.health.copy()
+        self.dealt = np.zeros(len(stats))
+        self.boss_attack = float(boss[0])
+
+        # The attackers hit the scaled health, which lowers their damage and thus
+        # the health needed. Mitigation and crits are capped, so a second pass
+        # against the first estimate is enough to settle on a value.
+        self.boss_health = float(boss[1])
+        for _ in range(2):
+            self._crit, self._base, self._crit_damage = damage_table(self.attack, self.boss_health)
+            expected = self._base * (1 - self._crit) + self._crit_damage * self._crit
+            self.boss_health = max(float(boss[1]), float(expected.sum()) * RAID_TARGET_TICKS)
+        self._crit, self._base, self._crit_damage = damage_table(self.attack, self.boss_health)
+        self.boss_hp = self.boss_health
+        # the boss against each attacker, taking their own health into account
+        self._boss_crit, self._boss_base, self._boss_crit_damage = damage_table(
+            self.boss_attack, self.health
+        )
+        self.ticks = 0
+
+    @property
+    def standing(self) -> int:
+        return int((self.hp > 0).sum())
+
+    @property
+    def is_over(self) -> bool:
+        return self.boss_hp <= 0 or self.standing == 0 or self.ticks >= RAID_MAX_TICKS
+
+    @property
+    def victory(self) -> bool:
+        return self.boss_hp <= 0
+
+    def tick(self) -> Tick:
+        self.ticks += 1
+        alive = self.hp > 0
+        crits = alive & (self.rng.random(len(self.hp)) < self._crit)
+        damage = np.where(alive, np.where(crits, self._crit_damage, self._base), 0)
+        self.dealt += damage
+        self.boss_hp -= float(damage.sum())
+
+        knocked_out: List[int] = []
+        if self.boss_hp > 0:
+            targets = np.flatnonzero(alive)
+            hits = min(len(targets), max(1, len(targets) // RAID_ATTACKERS_PER_BOSS_HIT))
+            targets = self.rng.choice(targets, hits, replace=False)
+            boss_crits = self.rng.random(hits) < self._boss_crit[targets]
+            self.hp[targets] -= np.where(
+                boss_crits, self._boss_crit_damage[targets], self._boss_base[targets]
+            )
+            knocked_out = [int(i) for i in targets if self.hp[i] <= 0]
+
+        return Tick(self.ticks, float(damage.sum()), int(crits.sum()), max(self.boss_hp, 0.0), knocked_out)
+
+    def top_attackers(self, limit: int) -> List[int]:
+        """Indexes of the attackers who dealt the most damage, best first."""
+        return [int(i) for i in np.argsort(-self.dealt, kind="stable")[:limit]]
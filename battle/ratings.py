@@ -0,0 +1,94 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_RATING = 1000.0
+K_FACTOR = 32.0
+
+# (discord_id, rating, wins, losses, draws)
+RatingRow = Tuple[int, float, int, int, int]
+
+
+def expected_score(rating: float, opponent_rating: float) -> float:
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def update_elo(rating1: float, rating2: float, score1: float) -> Tuple[float, float]:
+    """
+    New ratings of both players, `score1` being 1 if player 1 won, 0.5 for a draw
+    and 0 if they lost.
+    """
+    delta = K_FACTOR * (score1 - expected_score(rating1, rating2))
+    return rating1 + delta, rating2 - delta
+
+
+class RatingLadder:
+    """
+    In-memory copy of the rating table, kept sorted by rating.
+
+    Loaded once from the store, then updated in place on every result so the
+    leaderboard and ranks never need a sort query.
+    """
+
+    def __init__(self, rows: Iterable[RatingRow] = ()):
+        self._rows: Dict[int, RatingRow] = {}
+        # (-rating, discord_id), so the best player comes first
+        self._order: List[Tuple[float, int]] = []
+        for row in rows:
+            self._rows[row[0]] = row
+            self._order.append((-row[1], row[0]))
+        self._order.sort()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, discord_id: int) -> Optional[RatingRow]:
+        return self._rows.get(discord_id)
+
+    def rating(self, discord_id: int) -> float:
+        row = self._rows.get(discord_id)
+        return row[1] if row else DEFAULT_RATING
+
+    def rank(self, discord_id: int) -> Optional[int]:
+        """1-based leaderboard position of a player, None if they are unrated."""
+        row = self._rows.get(discord_id)
+        if row is None:
+            return None
+        return bisect_left(self._order, (-row[1], discord_id)) + 1
+
+    def top(self, limit: int, offset: int = 0) -> List[RatingRow]:
+        return [self._rows[discord_id] for _, discord_id in self._order[offset : offset + limit]]
+
+    def _set(self, row: RatingRow):
+        old = self._rows.get(row[0])
+        if old is not None:
+            del self._order[bisect_left(self._order, (-old[1], old[0]))]
+        self._rows[row[0]] = row
+        insort(self._order, (-row[1], row[0]))
+
+    def record(self, player1: int, player2: int, winner: int) -> Tuple[RatingRow, RatingRow]:
+        """
+        Apply the result of a battle, `winner` being 1, 2 or 0 for a draw.
+
+        Returns the updated rows of both players, ready to be written to the store.
+        """
+        _, rating1, wins1, losses1, draws1 = self._rows.get(player1) or (player1, DEFAULT_RATING, 0, 0, 0)
+        _, rating2, wins2, losses2, draws2 = self._rows.get(player2) or (player2, DEFAULT_RATING, 0, 0, 0)
+        score1 = {0: 0.5, 1: 1.0, 2: 0.0}[winner]
+        rating1, rating2 = update_elo(rating1, rating2, score1)
+        row1 = (
+            player1,
+            rating1,
+            wins1 + (winner == 1),
+            losses1 + (winner == 2),
+            draws1 + (winner == 0),
+        )
+        row2 = (
+            player2,
+            rating2,
+            wins2 + (winner == 2),
+            losses2 + (winner == 1),
+            draws2 + (winner == 0),
+        )
+        self._set(row1)
+        self._set(row2)
+        return row1, row2
@@ -0,0 +1,57 @@
+from typing import TYPE_CHECKING, Dict, Iterator, Optional, Set
+
+if TYPE_CHECKING:
+    from ballsdex.packages.battle.menu import BattleMenu
+
+
+class BattleRegistry:
+    """
+    Live battles, indexed by guild and by participant.
+
+    A user can only take part in one battle at a time, so looking up the battle of
+    a user is a single dictionary access. Each guild can host up to
+    `max_per_guild` battles at once.
+    """
+
+    def __init__(self, max_per_guild: int):
+        self.max_per_guild = max_per_guild
+        self._by_guild: Dict[int, Set["BattleMenu"]] = {}
+        self._by_user: Dict[int, "BattleMenu"] = {}
+
+    def __len__(self) -> int:
+        return sum(len(battles) for battles in self._by_guild.values())
+
+    def __contains__(self, battle: "BattleMenu") -> bool:
+        return self._by_user.get(battle.battler1.user.id) is battle
+
+    def __iter__(self) -> Iterator["BattleMenu"]:
+        for battles in list(self._by_guild.values()):
+            yield from list(battles)
+
+    def get(self, user_id: int) -> Optional["BattleMenu"]:
+        """Return the battle this user is taking part in, if any."""
+        return self._by_user.get(user_id)
+
+    def count(self, guild_id: int) -> int:
+        return len(self._by_guild.get(guild_id, ()))
+
+    def is_full(self, guild_id: int) -> bool:
+        return self.count(guild_id) >= self.max_per_guild
+
+    def add(self, battle: "BattleMenu"):
+        for battler in (battle.battler1, battle.battler2):
+            if battler.user.id in self._by_user:
+                raise ValueError(f"User {battler.user.id} is already in a battle.")
+        self._by_guild.setdefault(battle.channel.guild.id, set()).add(battle)
+        for battler in (battle.battler1, battle.battler2):
+            self._by_user[battler.user.id] = battle
+
+    def remove(self, battle: "BattleMenu"):
+        guild_battles = self._by_guild.get(battle.channel.guild.id)
+        if guild_battles is not None:
+            guild_battles.discard(battle)
+            if not guild_battles:
+                del self._by_guild[battle.channel.guild.id]
+        for battler in (battle.battler1, battle.battler2):
+            if self._by_user.get(battler.user.id) is battle:
+                del self._by_user[battler.user.id]
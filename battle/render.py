@@ -0,0 +1,125 @@
+from collections import deque
+from typing import Deque, Sequence
+
+from ballsdex.packages.battle.engine import (
+    ATTACK,
+    CRIT,
+    DRAW,
+    FIRST_STRIKE,
+    KNOCKOUT,
+    ROUND_START,
+    ROUND_WIN,
+    Event,
+    RoundResult,
+)
+
+ATTACK_EMOJIS = ["⚔️", "🗡️", "👊", "💢", "💫"]
+CRIT_EMOJIS = ["💥", "✨", "🌟", "🔥", "⚡"]
+ATTACK_VERBS = [
+    "deals",
+    "delivers",
+    "unleashes",
+    "strikes for",
+    "hits for",
+    "inflicts",
+    "lands",
+    "bursts for",
+    "lashes out for",
+    "smashes for",
+    "hammers for",
+    "slashes for",
+]
+VICTORY_EMOJIS = ["🏆", "👑", "🏅", "✨", "🌟", "💫", "🎉", "🎊"]
+VICTORY_PHRASES = [
+    "wins the round!",
+    "secures the victory!",
+    "dominates this duel!",
+    "controls the battlefield!",
+    "outplays the opponent!",
+    "emerges triumphant!",
+]
+
+
+def render_event(
+    event: Event, round_result: RoundResult, countries: Sequence[str], players: Sequence[str]
+) -> str:
+    """
+    Turn an engine event into the line shown in the battle log.
+
+    `countries` holds the names of both fighting balls and `players` the display
+    names of both battlers, in side order.
+    """
+    if event.code == ROUND_START:
+        (attack1, health1), (attack2, health2) = round_result.fighters
+        return (
+            f"Round {round_result.number} begins!\n"
+            f"⚔️ {countries[0]} (ATK:{attack1} HP:{health1}) vs "
+            f"{countries[1]} (ATK:{attack2} HP:{health2})"
+        )
+    if event.code == FIRST_STRIKE:
+        return f"🎲 First strike: {countries[event.side - 1]}"
+    if event.code in (ATTACK, CRIT):
+        attacker = countries[event.side - 1]
+        if event.code == CRIT:
+            emoji = CRIT_EMOJIS[event.roll % len(CRIT_EMOJIS)]
+            message = f"{emoji} {attacker} crits for {event.damage:.0f} damage!"
+        else:
+            emoji = ATTACK_EMOJIS[event.roll % len(ATTACK_EMOJIS)]
+            verb = ATTACK_VERBS[(event.roll // len(ATTACK_EMOJIS)) % len(ATTACK_VERBS)]
+            message = f"{emoji} {attacker} {verb} {event.damage:.0f} damage!"
+        if event.mitigation > 0:
+            message += f" (mitigation: {event.mitigation * 100:.0f}%)"
+        return message + f" (defender HP: {max(0, event.hp):.0f})"
+    if event.code == KNOCKOUT:
+        return f"💀 {countries[event.side - 1]} is down!"
+    if event.code == DRAW:
+        return "⚠️ Both sides are exhausted. This round ends in a draw."
+    if event.code == ROUND_WIN:
+        emoji = VICTORY_EMOJIS[event.roll % len(VICTORY_EMOJIS)]
+        phrase = VICTORY_PHRASES[(event.roll // len(VICTORY_EMOJIS)) % len(VICTORY_PHRASES)]
+        return f"\n{emoji} {players[event.side - 1]} {phrase}"
+    raise ValueError(f"Unknown battle event code {event.code}")
+
+
+# Discord rejects embed descriptions longer than 4096 characters, keep some margin.
+EMBED_DESCRIPTION_BUDGET = 4000
+TRIMMED_MARKER = "…"
+
+
+class LogBuffer:
+    """
+    Battle log that always fits in an embed description.
+
+    The rendered text is kept up to date on every append: the new line is added
+    at the end and, once the log is over budget, the oldest lines are cut from
+    the front in one slice. Rendering returns that text as is, so nothing is
+    joined again no matter how long the round gets.
+    """
+
+    def __init__(self, budget: int = EMBED_DESCRIPTION_BUDGET):
+        self.budget = budget
+        # lengths of the kept lines, oldest first
+        self.line_lengths: Deque[int] = deque()
+        self.length = 0
+        self.trimmed = False
+        self._text = ""
+
+    def append(self, line: str):
+        line = line[: self.budget - len(TRIMMED_MARKER) - 1]
+        self._text = f"{self._text}\n{line}" if self.line_lengths else line
+        self.line_lengths.append(len(line))
+        self.length += len(line) + 1
+        # self.length is the kept lines plus one, the marker line adds the rest
+        cut = 0
+        while self.length > self.budget - len(TRIMMED_MARKER):
+            dropped = self.line_lengths.popleft() + 1
+            self.length -= dropped
+            cut += dropped
+        if cut:
+            # once trimmed, the text starts with the marker line
+            start = len(TRIMMED_MARKER) + 1 if self.trimmed else 0
+            self._text = f"{TRIMMED_MARKER}\n{self._text[start + cut:]}"
+            self.trimmed = True
+
+    def render(self) -> str:
+        return self._text
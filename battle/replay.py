@@ -0,0 +1,116 @@
+from typing import Iterator, List, NamedTuple, Sequence, Tuple
+
+from ballsdex.packages.battle.engine import (
+    ATTACK,
+    CRIT,
+    ROUND_START,
+    ROUND_WIN,
+    BattleResult,
+    Event,
+    RoundResult,
+    attack_damage,
+    mitigation,
+)
+
+REPLAY_VERSION = 1
+
+
+class ReplayBall(NamedTuple):
+    pk: int
+    ball_id: int
+    attack: int
+    health: int
+
+
+class Replay(NamedTuple):
+    players: Tuple[int, int]
+    rosters: Tuple[List[ReplayBall], List[ReplayBall]]
+    result: BattleResult
+
+
+def _write_varint(buffer: bytearray, value: int):
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def _read_varints(data: bytes) -> Iterator[int]:
+    value = shift = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            yield value
+            value = shift = 0
+
+
+def encode_replay(
+    result: BattleResult, players: Tuple[int, int], rosters: Tuple[Sequence, Sequence]
+) -> bytes:
+    """
+    Pack a finished battle into a few hundred bytes.
+
+    Only the seed, the rosters and one (code, side) and one flavor byte per
+    event are stored. Damage and remaining HP are recomputed from the stats
+    when decoding, since the engine is deterministic.
+    """
+    buffer = bytearray()
+    for value in (REPLAY_VERSION, result.seed, players[0], players[1]):
+        _write_varint(buffer, value)
+    for roster in rosters:
+        _write_varint(buffer, len(roster))
+        for ball in roster:
+            for value in (ball.pk, ball.ball_id, ball.attack, ball.health):
+                _write_varint(buffer, value)
+    events = [event for round_result in result.rounds for event in round_result.events]
+    _write_varint(buffer, len(events))
+    for event in events:
+        buffer.append(event.code << 2 | event.side)
+        buffer.append(event.roll)
+    return bytes(buffer)
+
+
+def decode_replay(data: bytes) -> Replay:
+    varints = _read_varints(data)
+    version = next(varints)
+    if version != REPLAY_VERSION:
+        raise ValueError(f"Unsupported replay version {version}")
+    seed, player1, player2 = next(varints), next(varints), next(varints)
+    rosters: Tuple[List[ReplayBall], List[ReplayBall]] = ([], [])
+    for roster in rosters:
+        for _ in range(next(varints)):
+            roster.append(ReplayBall(next(varints), next(varints), next(varints), next(varints)))
+    event_count = next(varints)
+    header_end = len(data) - event_count * 2
+
+    rounds: List[RoundResult] = []
+    wins = [0, 0]
+    events: List[Event] = []
+    hp = [0.0, 0.0]
+    fighters = ((0, 0), (0, 0))
+    for i in range(header_end, len(data), 2):
+        code, side, roll = data[i] >> 2, data[i] & 0b11, data[i + 1]
+        if code == ROUND_START:
+            number = len(rounds) + 1
+            ball1, ball2 = rosters[0][number - 1], rosters[1][number - 1]
+            fighters = ((ball1.attack, ball1.health), (ball2.attack, ball2.health))
+            hp = [float(ball1.health), float(ball2.health)]
+            events = []
+            rounds.append(RoundResult(number, fighters, 0, events))
+        if code in (ATTACK, CRIT):
+            attack = fighters[side - 1][0]
+            defender_health = fighters[2 - side][1]
+            damage = attack_damage(attack, defender_health, code == CRIT)
+            hp[2 - side] -= damage
+            event = Event(
+                code, side, damage, hp[2 - side], mitigation(attack, defender_health), roll
+            )
+        else:
+            event = Event(code, side, roll=roll)
+        events.append(event)
+        if code == ROUND_WIN:
+            rounds[-1] = rounds[-1]._replace(winner=side)
+            wins[side - 1] += 1
+    return Replay((player1, player2), rosters, BattleResult(seed, rounds, (wins[0], wins[1])))
@@ -0,0 +1,47 @@
+from typing import NamedTuple, Optional, Tuple
+
+from ballsdex.packages.battle.engine import ATTACK, CRIT, RoundResult
+
+
+class BallStats(NamedTuple):
+    appearances: int = 0
+    wins: int = 0
+    crits: int = 0
+    attacks: int = 0
+    damage: float = 0.0
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.appearances if self.appearances else 0.0
+
+    @property
+    def average_damage(self) -> float:
+        return self.damage / self.attacks if self.attacks else 0.0
+
+
+def round_stats(round_result: RoundResult) -> Tuple[BallStats, BallStats]:
+    """Counters gained by both fighters of a single round."""
+    crits = [0, 0]
+    attacks = [0, 0]
+    damage = [0.0, 0.0]
+    for event in round_result.events:
+        if event.code in (ATTACK, CRIT):
+            attacks[event.side - 1] += 1
+            damage[event.side - 1] += event.damage
+            if event.code == CRIT:
+                crits[event.side - 1] += 1
+    return tuple(
+        BallStats(1, int(round_result.winner == side), crits[side - 1], attacks[side - 1], damage[side - 1])
+        for side in (1, 2)
+    )
+
+
+def format_stats(stats: Optional[BallStats]) -> str:
+    if not stats or not stats.appearances:
+        return "No battles yet."
+    return (
+        f"Rounds fought: {stats.appearances}\n"
+        f"Rounds won: {stats.wins} ({stats.win_rate:.0%})\n"
+        f"Critical hits: {stats.crits}\n"
+        f"Average damage: {stats.average_damage:.1f}"
+    )
@@ -0,0 +1,197 @@
+import asyncio
+import os
+from array import array
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+from ballsdex.packages.battle.stats import BallStats
+
+BATTLE_DB_FILE = os.path.join(os.path.dirname(__file__), "battle.db")
+
+T = TypeVar("T")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS replays (
+    id INTEGER PRIMARY KEY,
+    created_at INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ratings (
+    discord_id INTEGER PRIMARY KEY,
+    rating REAL NOT NULL,
+    wins INTEGER NOT NULL DEFAULT 0,
+    losses INTEGER NOT NULL DEFAULT 0,
+    draws INTEGER NOT NULL DEFAULT 0,
+    updated_at INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ratings_rating ON ratings (rating DESC);
+CREATE TABLE IF NOT EXISTS species_stats (
+    ball_id INTEGER PRIMARY KEY,
+    appearances INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    crits INTEGER NOT NULL,
+    attacks INTEGER NOT NULL,
+    damage REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS instance_stats (
+    instance_id INTEGER PRIMARY KEY,
+    appearances INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    crits INTEGER NOT NULL,
+    attacks INTEGER NOT NULL,
+    damage REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS presets (
+    discord_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    balls BLOB NOT NULL,
+    updated_at INTEGER NOT NULL,
+    PRIMARY KEY (discord_id, name)
+) WITHOUT ROWID;
+"""
+
+# the same upsert for both stats tables, adding the new counters to the stored ones
+STATS_UPSERT = (
+    "INSERT INTO {table} ({key}, appearances, wins, crits, attacks, damage) "
+    "VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT ({key}) DO UPDATE SET "
+    "appearances = appearances + excluded.appearances, wins = wins + excluded.wins, "
+    "crits = crits + excluded.crits, attacks = attacks + excluded.attacks, "
+    "damage = damage + excluded.damage"
+)
+
+
+class BattleStore:
+    """
+    SQLite storage for everything the battle package keeps between restarts.
+
+    The methods are blocking. From the event loop, call them through `run` so
+    they execute one at a time on the store's own thread.
+    """
+
+    def __init__(self, path: str = BATTLE_DB_FILE):
+        # only used by one thread at a time: the caller of __init__, then the executor
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="battle-store")
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    async def run(self, function: Callable[..., T], *args: Any) -> T:
+        """Run a store method on the store thread and wait for its result."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.connection.close()
+
+    def save_replay(self, data: bytes) -> int:
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO replays (created_at, data) VALUES (?, ?)", (int(time.time()), data)
+            )
+        return cursor.lastrowid
+
+    def save_replays(self, data: Sequence[bytes]) -> List[int]:
+        """Store many replays in one transaction, returning their IDs in order."""
+        now = int(time.time())
+        ids = []
+        with self.connection:
+            for replay in data:
+                cursor = self.connection.execute(
+                    "INSERT INTO replays (created_at, data) VALUES (?, ?)", (now, replay)
+                )
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def get_replay(self, replay_id: int) -> Optional[bytes]:
+        row = self.connection.execute(
+            "SELECT data FROM replays WHERE id = ?", (replay_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get_ratings(self) -> List[Tuple[int, float, int, int, int]]:
+        return self.connection.execute(
+            "SELECT discord_id, rating, wins, losses, draws FROM ratings ORDER BY rating DESC"
+        ).fetchall()
+
+    def save_ratings(self, rows: Iterable[Tuple[int, float, int, int, int]]):
+        now = int(time.time())
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO ratings (discord_id, rating, wins, losses, draws, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (discord_id) DO UPDATE SET rating = excluded.rating, "
+                "wins = excluded.wins, losses = excluded.losses, draws = excluded.draws, "
+                "updated_at = excluded.updated_at",
+                [(*row, now) for row in rows],
+            )
+
+    def add_stats(
+        self,
+        species: Iterable[Tuple[int, BallStats]],
+        instances: Iterable[Tuple[int, BallStats]],
+    ):
+        """Add counters to the species and instance aggregates in one transaction."""
+        with self.connection:
+            self.connection.executemany(
+                STATS_UPSERT.format(table="species_stats", key="ball_id"),
+                [(ball_id, *stats) for ball_id, stats in species],
+            )
+            self.connection.executemany(
+                STATS_UPSERT.format(table="instance_stats", key="instance_id"),
+                [(pk, *stats) for pk, stats in instances],
+            )
+
+    def get_species_stats(self, ball_id: int) -> Optional[BallStats]:
+        row = self.connection.execute(
+            "SELECT appearances, wins, crits, attacks, damage FROM species_stats WHERE ball_id = ?",
+            (ball_id,),
+        ).fetchone()
+        return BallStats(*row) if row else None
+
+    def get_instance_stats(self, instance_id: int) -> Optional[BallStats]:
+        row = self.connection.execute(
+            "SELECT appearances, wins, crits, attacks, damage FROM instance_stats "
+            "WHERE instance_id = ?",
+            (instance_id,),
+        ).fetchone()
+        return BallStats(*row) if row else None
+
+    def save_preset(self, discord_id: int, name: str, ball_ids: Sequence[int]):
+        """Store a named lineup, replacing any preset with the same name."""
+        with self.connection:
+            self.connection.execute(
+                "INSERT INTO presets (discord_id, name, balls, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (discord_id, name) DO UPDATE SET "
+                "balls = excluded.balls, updated_at = excluded.updated_at",
+                (discord_id, name, array("q", ball_ids).tobytes(), int(time.time())),
+            )
+
+    def get_preset(self, discord_id: int, name: str) -> Optional[List[int]]:
+        row = self.connection.execute(
+            "SELECT balls FROM presets WHERE discord_id = ? AND name = ?", (discord_id, name)
+        ).fetchone()
+        if not row:
+            return None
+        ball_ids = array("q")
+        ball_ids.frombytes(row[0])
+        return ball_ids.tolist()
+
+    def count_presets(self, discord_id: int) -> int:
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM presets WHERE discord_id = ?", (discord_id,)
+        ).fetchone()[0]
+
+    def list_presets(self, discord_id: int) -> List[Tuple[str, int]]:
+        """Names of the presets of a player with their number of balls."""
+        return [
+            (name, size // array("q").itemsize)
+            for name, size in self.connection.execute(
+                "SELECT name, LENGTH(balls) FROM presets WHERE discord_id = ? ORDER BY name",
+                (discord_id,),
+            )
+        ]
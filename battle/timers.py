@@ -0,0 +1,81 @@
+import asyncio
+import heapq
+import itertools
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+
+class Deadline:
+    __slots__ = ("when", "callback", "cancelled")
+
+    def __init__(self, when: float, callback: Callable[[], Awaitable[Any]]):
+        self.when = when
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class DeadlineScheduler:
+    """
+    Shared deadline scheduler for every live battle.
+
+    Deadlines are kept in a heap and a single event loop timer is armed for the
+    earliest one, so pending battles cost nothing until one of them is due.
+    Cancelled deadlines are dropped lazily when they reach the top of the heap.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int, Deadline]] = []
+        self._counter = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return sum(1 for _, _, deadline in self._heap if not deadline.cancelled)
+
+    def schedule(self, delay: float, callback: Callable[[], Awaitable[Any]]) -> Deadline:
+        """Run the coroutine function `callback` in `delay` seconds."""
+        loop = asyncio.get_running_loop()
+        deadline = Deadline(loop.time() + delay, callback)
+        heapq.heappush(self._heap, (deadline.when, next(self._counter), deadline))
+        if self._heap[0][2] is deadline:
+            self._arm(loop)
+        return deadline
+
+    def close(self):
+        """Drop every deadline and stop callbacks that are still running."""
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        self._heap.clear()
+        for task in self._tasks:
+            task.cancel()
+
+    def _arm(self, loop: asyncio.AbstractEventLoop):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        while self._heap and self._heap[0][2].cancelled:
+            heapq.heappop(self._heap)
+        if self._heap:
+            self._timer = loop.call_at(self._heap[0][0], self._fire, loop)
+
+    def _fire(self, loop: asyncio.AbstractEventLoop):
+        self._timer = None
+        now = loop.time()
+        while self._heap and self._heap[0][0] <= now:
+            _, _, deadline = heapq.heappop(self._heap)
+            if deadline.cancelled:
+                continue
+            deadline.cancelled = True
+            task = loop.create_task(self._run(deadline))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self._arm(loop)
+
+    async def _run(self, deadline: Deadline):
+        try:
+            await deadline.callback()
+        except Exception as e:
+            print(f"Battle timer callback failed: {str(e)}")
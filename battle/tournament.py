@@ -0,0 +1,133 @@
+import asyncio
+import math
+import random
+from concurrent.futures import Executor
+from dataclasses import dataclass, field
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from ballsdex.packages.battle.engine import simulate_battle
+from ballsdex.packages.battle.replay import ReplayBall, encode_replay
+
+MIN_ENTRANTS = 2
+MAX_ENTRANTS = 256
+
+
+class Entrant(NamedTuple):
+    user_id: int
+    rating: float
+    roster: Sequence[ReplayBall]
+
+
+@dataclass(slots=True)
+class TournamentSignup:
+    """Players registered for the next tournament of a server."""
+
+    host_id: int
+    entrants: Dict[int, Entrant] = field(default_factory=dict)
+    running: bool = False
+
+
+class MatchResult(NamedTuple):
+    round: int
+    player1: int
+    player2: int
+    winner: int  # discord id of the winner
+    wins: Tuple[int, int]
+    coin_toss: bool
+    replay: Optional[bytes]
+
+
+class TournamentResult(NamedTuple):
+    seed: int
+    rounds: List[List[MatchResult]]
+    byes: List[List[int]]
+
+    @property
+    def champion(self) -> int:
+        return self.rounds[-1][-1].winner
+
+
+def play_match(
+    round_number: int, entrant1: Entrant, entrant2: Entrant, seed: int, with_replay: bool
+) -> MatchResult:
+    """
+    Resolve a single bracket match. Drawn battles are decided by a coin toss
+    derived from the battle seed, so the match stays reproducible.
+    """
+    result = simulate_battle(
+        [(ball.attack, ball.health) for ball in entrant1.roster],
+        [(ball.attack, ball.health) for ball in entrant2.roster],
+        seed,
+    )
+    winner = result.winner or random.Random(seed).choice((1, 2))
+    replay = None
+    if with_replay:
+        replay = encode_replay(
+            result, (entrant1.user_id, entrant2.user_id), (entrant1.roster, entrant2.roster)
+        )
+    return MatchResult(
+        round_number,
+        entrant1.user_id,
+        entrant2.user_id,
+        entrant1.user_id if winner == 1 else entrant2.user_id,
+        result.wins,
+        not result.winner,
+        replay,
+    )
+
+
+def play_matches(
+    jobs: Sequence[Tuple[int, Entrant, Entrant, int, bool]]
+) -> List[MatchResult]:
+    """Resolve a batch of matches, run inside a worker process."""
+    return [play_match(*job) for job in jobs]
+
+
+async def run_bracket(
+    entrants: Sequence[Entrant],
+    executor: Optional[Executor] = None,
+    workers: int = 1,
+    seed: Optional[int] = None,
+    with_replays: bool = False,
+) -> TournamentResult:
+    """
+    Play a single-elimination bracket without any Discord playback.
+
+    Entrants are seeded by rating: each round the best remaining seed meets the
+    worst one, and with an odd count the best seed gets a bye. The matches of a
+    round are split in `workers` batches and resolved in parallel on `executor`.
+    """
+    if len(entrants) < MIN_ENTRANTS:
+        raise ValueError(f"A tournament needs at least {MIN_ENTRANTS} entrants.")
+    if seed is None:
+        seed = random.getrandbits(64)
+    rng = random.Random(seed)
+    loop = asyncio.get_running_loop()
+    by_id: Dict[int, Entrant] = {entrant.user_id: entrant for entrant in entrants}
+    remaining = sorted(entrants, key=lambda entrant: entrant.rating, reverse=True)
+    rounds: List[List[MatchResult]] = []
+    byes: List[List[int]] = []
+
+    while len(remaining) > 1:
+        round_number = len(rounds) + 1
+        round_byes = [remaining.pop(0).user_id] if len(remaining) % 2 else []
+        half = len(remaining) // 2
+        jobs = [
+            (round_number, remaining[i], remaining[-1 - i], rng.getrandbits(64), with_replays)
+            for i in range(half)
+        ]
+        batch_size = math.ceil(len(jobs) / max(workers, 1))
+        batches = [jobs[i : i + batch_size] for i in range(0, len(jobs), batch_size)]
+        results = await asyncio.gather(
+            *(loop.run_in_executor(executor, play_matches, batch) for batch in batches)
+        )
+        matches = [match for batch in results for match in batch]
+        rounds.append(matches)
+        byes.append(round_byes)
+        remaining = sorted(
+            [by_id[user_id] for user_id in round_byes] + [by_id[match.winner] for match in matches],
+            key=lambda entrant: entrant.rating,
+            reverse=True,
+        )
+
+    return TournamentResult(seed, rounds, byes)
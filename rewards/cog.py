@@ -7,6 +7,7 @@ import asyncio
 from datetime import datetime, timedelta, timezone
 import json
 import os
+import sqlite3
 
 from ballsdex.core.models import BallInstance, Player as PlayerModel, Ball, Economy, Regime, Special
 from ballsdex.core.utils.enums import SortingChoices
@@ -18,14 +19,153 @@ from ballsdex.settings import settings
 from ballsdex.core.utils.buttons import ConfirmChoiceView
 
 PENDING_REWARDS_FILE = os.path.join(os.path.dirname(__file__), "pending_rewards.json")
+PENDING_REWARDS_DB = os.path.join(os.path.dirname(__file__), "pending_rewards.db")
+# Seconds pending reward writes are held so they are saved together.
+WRITE_BATCH_DELAY = 1
 OPT_OUT_FILE = os.path.join(os.path.dirname(__file__), "opt_out.json")
 
+# Reward DMs sent at once, and the bounds of the adaptive send rate (DMs per second).
+DISTRIBUTION_CONCURRENCY = 20
+MIN_SEND_RATE = 1.0
+MAX_SEND_RATE = 40.0
+INITIAL_SEND_RATE = 10.0
+SEND_RATE_STEP = 1.0
+MAX_SEND_ATTEMPTS = 5
+PROGRESS_INTERVAL = 5
+# Interaction tokens expire after 15 minutes, switch to a channel message before that.
+INTERACTION_TOKEN_LIFETIME = 14 * 60
+# Players loaded per query, and users fetched from Discord at once, when rewarding everyone.
+PLAYER_CHUNK_SIZE = 1000
+RESOLVE_CONCURRENCY = 10
+
+class AdaptiveRateLimiter:
+    """
+    Paces reward DMs with additive increase, multiplicative decrease.
+
+    The rate grows by `SEND_RATE_STEP` per second of successful sends and is halved
+    on every 429, after which every worker waits out the retry delay.
+    """
+
+    def __init__(self, rate: float = INITIAL_SEND_RATE):
+        self.rate = rate
+        self.next_send = 0.0
+        self.paused_until = 0.0
+
+    async def acquire(self):
+        """Wait for the next send slot, and for any rate limit pause to end."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        send_at = max(self.next_send, self.paused_until, now)
+        self.next_send = send_at + 1 / self.rate
+        if send_at > now:
+            await asyncio.sleep(send_at - now)
+        while loop.time() < self.paused_until:
+            await asyncio.sleep(self.paused_until - loop.time())
+
+    def success(self):
+        self.rate = min(MAX_SEND_RATE, self.rate + SEND_RATE_STEP / self.rate)
+
+    def rate_limited(self, retry_after: float):
+        self.rate = max(MIN_SEND_RATE, self.rate / 2)
+        self.paused_until = max(self.paused_until, asyncio.get_running_loop().time() + retry_after)
+
+def retry_delay(error: Exception) -> Optional[float]:
+    """Seconds to wait if `error` is a rate limit, None otherwise."""
+    if isinstance(error, discord.RateLimited):
+        return error.retry_after
+    if isinstance(error, discord.HTTPException) and error.status == 429:
+        try:
+            return float(error.response.headers.get("Retry-After", 1))
+        except (AttributeError, TypeError, ValueError):
+            return 1.0
+    return None
+
+def token_expiring(interaction: discord.Interaction) -> bool:
+    """Whether followups of this interaction may no longer be accepted."""
+    return (discord.utils.utcnow() - interaction.created_at).total_seconds() > INTERACTION_TOKEN_LIFETIME
+
 class PendingReward:
     def __init__(self, user_id: int, reward_info: Dict[str, Any], expiry_time: datetime):
         self.user_id = user_id
         self.reward_info = reward_info
         self.expiry_time = expiry_time
 
+class PendingRewardStore:
+    """
+    SQLite table of unclaimed rewards, one row per user.
+
+    Writes come from RewardManager's writer task, which runs them in a worker
+    thread, so the connection is shared across threads.
+    """
+
+    def __init__(self, path: str = PENDING_REWARDS_DB):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS pending_rewards (
+                user_id INTEGER PRIMARY KEY,
+                reward_info TEXT NOT NULL,
+                expiry_time REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS pending_rewards_expiry ON pending_rewards (expiry_time);
+            """
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def load(self) -> Dict[int, PendingReward]:
+        return {
+            user_id: PendingReward(user_id, json.loads(reward_info), datetime.fromtimestamp(expiry_time))
+            for user_id, reward_info, expiry_time in self.connection.execute(
+                "SELECT user_id, reward_info, expiry_time FROM pending_rewards"
+            )
+        }
+
+    def upsert(self, rewards: List[PendingReward]):
+        self.apply([("upsert", reward) for reward in rewards])
+
+    def apply(self, writes: List[tuple]):
+        """
+        Run queued writes in a single transaction, in order.
+
+        Each write is ("upsert", PendingReward), ("delete", user_id) or
+        ("expire", timestamp).
+        """
+        with self.connection:
+            for kind, value in writes:
+                if kind == "upsert":
+                    self.connection.execute(
+                        "INSERT INTO pending_rewards (user_id, reward_info, expiry_time) VALUES (?, ?, ?) "
+                        "ON CONFLICT (user_id) DO UPDATE SET "
+                        "reward_info = excluded.reward_info, expiry_time = excluded.expiry_time",
+                        (value.user_id, json.dumps(value.reward_info, ensure_ascii=False), value.expiry_time.timestamp())
+                    )
+                elif kind == "delete":
+                    self.connection.execute("DELETE FROM pending_rewards WHERE user_id = ?", (value,))
+                elif kind == "expire":
+                    self.connection.execute("DELETE FROM pending_rewards WHERE expiry_time < ?", (value,))
+
+    def migrate_json(self, path: str):
+        """Import the rewards of the old JSON file once, then set the file aside."""
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = f.read()
+            data = json.loads(content) if content.strip() else {}
+            self.upsert([
+                PendingReward(int(uid), info["reward_info"], datetime.fromisoformat(info["expiry_time"]))
+                for uid, info in data.items()
+            ])
+        except Exception as e:
+            print(f"Error migrating pending rewards from {path}: {str(e)}")
+            return
+        os.replace(path, path + ".migrated")
+
 class RewardClaimView(discord.ui.View):
     def __init__(self, reward_manager, user_id: int, reward_info: Dict[str, Any], expiry_time: datetime):
         super().__init__(timeout=None)
@@ -132,9 +272,7 @@ class RewardClaimView(discord.ui.View):
             
             self.claimed = True
             try:
-                if interaction.user.id in self.reward_manager.pending_rewards:
-                    del self.reward_manager.pending_rewards[interaction.user.id]
-                    self.reward_manager.save_pending_rewards()
+                self.reward_manager.remove_pending_reward(interaction.user.id)
             except Exception as e:
                 print(f"Error removing pending reward: {str(e)}")
             try:
@@ -185,9 +323,7 @@ class RewardClaimView(discord.ui.View):
             self.reward_manager.add_to_opt_out(interaction.user.id)
 
             try:
-                if interaction.user.id in self.reward_manager.pending_rewards:
-                    del self.reward_manager.pending_rewards[interaction.user.id]
-                    self.reward_manager.save_pending_rewards()
+                self.reward_manager.remove_pending_reward(interaction.user.id)
             except Exception as e:
                 print(f"Error removing pending reward: {str(e)}")
 
@@ -224,33 +360,52 @@ class RewardManager:
         rewards_dir = os.path.dirname(PENDING_REWARDS_FILE)
         if not os.path.exists(rewards_dir):
             os.makedirs(rewards_dir)
-        self.pending_rewards = self.load_pending_rewards()
+        self.pending_store = PendingRewardStore()
+        self.pending_store.migrate_json(PENDING_REWARDS_FILE)
+        self.pending_rewards = self.pending_store.load()
+        self._pending_writes: List[tuple] = []
+        self._writer: Optional[asyncio.Task] = None
         self.confirmation_timeout = 86400
         self.opt_out_users = self.load_opt_out()
 
-    def load_pending_rewards(self):
-        if os.path.exists(PENDING_REWARDS_FILE):
-            with open(PENDING_REWARDS_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            result = {}
-            for uid, info in data.items():
-                result[int(uid)] = PendingReward(
-                    int(uid),
-                    info["reward_info"],
-                    datetime.fromisoformat(info["expiry_time"])
-                )
-            return result
-        return {}
-
-    def save_pending_rewards(self):
-        data = {}
-        for uid, reward in self.pending_rewards.items():
-            data[str(uid)] = {
-                "reward_info": reward.reward_info,
-                "expiry_time": reward.expiry_time.isoformat()
-            }
-        with open(PENDING_REWARDS_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+    def _queue_write(self, kind: str, value: Any):
+        self._pending_writes.append((kind, value))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_pending())
+
+    async def _write_pending(self):
+        """Flush queued writes in batches, away from the event loop."""
+        while self._pending_writes:
+            # let the writes of a distribution accumulate into one transaction
+            await asyncio.sleep(WRITE_BATCH_DELAY)
+            writes, self._pending_writes = self._pending_writes, []
+            try:
+                await asyncio.to_thread(self.pending_store.apply, writes)
+            except Exception as e:
+                print(f"Error saving pending rewards: {str(e)}")
+
+    async def close(self):
+        """Flush the writes still queued and close the store."""
+        if self._writer and not self._writer.done():
+            await self._writer
+        if self._pending_writes:
+            await self._write_pending()
+        self.pending_store.close()
+
+    def add_pending_reward(self, reward: PendingReward):
+        self.pending_rewards[reward.user_id] = reward
+        self._queue_write("upsert", reward)
+
+    def remove_pending_reward(self, user_id: int):
+        if self.pending_rewards.pop(user_id, None) is not None:
+            self._queue_write("delete", user_id)
+
+    def remove_expired_rewards(self):
+        now = datetime.now()
+        for user_id, reward in list(self.pending_rewards.items()):
+            if now > reward.expiry_time:
+                del self.pending_rewards[user_id]
+        self._queue_write("expire", now.timestamp())
 
     def load_opt_out(self):
         """Load opt-out user list"""
@@ -296,17 +451,19 @@ class RewardManager:
             )
             message = await user.send(embed=embed, view=view)
             
-            self.pending_rewards[user.id] = PendingReward(user.id, reward_info, expiry_time)
-            self.save_pending_rewards()
+            self.add_pending_reward(PendingReward(user.id, reward_info, expiry_time))
             
             view.message = message
             
             return True
         except discord.Forbidden:
-            await interaction.channel.send(f'⚠️ | Could not distribute rewards to {user.id} {user.name} as they have their DM closed')
-            return False
+            # closed DMs are counted by distribute_rewards
+            raise
         except Exception as e:
-            await interaction.channel.send(f"Error occurred while distributing reward: {str(e)}")
+            if retry_delay(e) is not None:
+                # let the distribution workers back off and retry
+                raise
+            print(f"Error occurred while distributing reward to {user.id}: {str(e)}")
             return False
 
     async def check_pending_reward(self, user_id: int) -> Optional[Dict[str, Any]]:
@@ -315,8 +472,7 @@ class RewardManager:
             
         reward = self.pending_rewards[user_id]
         if datetime.now() > reward.expiry_time:
-            del self.pending_rewards[user_id]
-            self.save_pending_rewards()
+            self.remove_pending_reward(user_id)
             return None
             
         return reward.reward_info
@@ -331,72 +487,161 @@ class RewardManager:
         target_users: Optional[List[discord.User]] = None,
         reward_count: int = 1,
         interaction: Optional[discord.Interaction] = None,
-        special_event: Optional[SpecialTransform] = None
+        special_event: Optional[SpecialTransform] = None,
+        concurrency: int = DISTRIBUTION_CONCURRENCY
     ) -> Dict[str, Any]:
         results = {
             "total_users": 0,
             "notified_users": 0,
             "failed_users": 0,
             "opt_out_users": 0,
-            "blacklisted_users": 0
+            "blacklisted_users": 0,
+            "dm_closed_users": 0
+        }
+        counts = {"notified": 0, "failed": 0, "dm_closed": 0, "opt_out": 0, "blacklisted": 0}
+        reward_info = {
+            "type": reward_type,
+            "description": reward_description,
+            "rarity_range": rarity_range,
+            "specific_balls": [b.id for b in specific_balls] if specific_balls else None,
+            "reward_count": reward_count,
+            "special_event": special_event.id if special_event else None
         }
-        progress_message = None
-        batch_size = 10
-        if not target_users:
+        if target_users:
+            total = len(target_users)
+        else:
+            # an upper bound, ids dropped while streaming are counted as they go
+            total = await PlayerModel.all().count()
+        progress_message = await interaction.followup.send(f":gift: Distributing rewards...\nNotified: 0\nFailed: 0\nDMs closed: 0\nOpted-out users: 0\nBlacklisted users: 0\nRemaining: {total}", ephemeral=True)
+        progress_on_webhook = True
+
+        async def show_progress(content: str):
+            nonlocal progress_message, progress_on_webhook
+            try:
+                if progress_on_webhook and token_expiring(interaction):
+                    progress_message = await interaction.channel.send(content)
+                    progress_on_webhook = False
+                else:
+                    await progress_message.edit(content=content)
+            except discord.HTTPException:
+                pass
+
+        # Players are streamed into `pending_ids`, resolved into users by the
+        # resolvers and sent by the workers, so DMs start going out right away.
+        pending_ids: asyncio.Queue = asyncio.Queue(maxsize=PLAYER_CHUNK_SIZE)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=PLAYER_CHUNK_SIZE)
+        limiter = AdaptiveRateLimiter()
+        opt_out_ids = set(self.opt_out_users)
+        skipped = 0
+
+        def keep(user_id: int) -> bool:
+            """Count and drop ids that must not receive anything."""
+            if user_id in self.bot.blacklist:
+                counts["blacklisted"] += 1
+                return False
+            if user_id in opt_out_ids:
+                counts["opt_out"] += 1
+                return False
+            return True
+
+        async def produce():
+            nonlocal skipped
+            if target_users:
+                for user in target_users:
+                    if keep(user.id):
+                        await queue.put(user)
+                return
             bot_id = bot.user.id
-            players = await PlayerModel.all()
-            target_users = []
-            for player in players:
-                if player.discord_id == bot_id:
-                    continue
-                user = bot.get_user(player.discord_id)
-                if not user:
-                    try:
-                        user = await bot.fetch_user(player.discord_id)
-                    except Exception:
-                        user = None
-                if user and not user.bot:
-                    target_users.append(user)
-        results["total_users"] = len(target_users)
-        total = len(target_users)
-        notified = 0
-        failed = 0
-        opt_out = 0
-        blacklisted = 0
-        progress_message = await interaction.followup.send(f":gift: Distributing rewards...\nNotified: 0\nFailed: 0\nOpted-out users: 0\nBlacklisted users: 0\nRemaining: {total}", ephemeral=True)
-        for i in range(0, total, batch_size):
-            batch = target_users[i:i+batch_size]
-            tasks = [self.send_reward_confirmation(interaction, user, {
-                "type": reward_type,
-                "description": reward_description,
-                "rarity_range": rarity_range,
-                "specific_balls": [b.id for b in specific_balls] if specific_balls else None,
-                "reward_count": reward_count,
-                "special_event": special_event.id if special_event else None
-            }) for user in batch]
-            results_list = []
-            for task in tasks:
+            last_id = 0
+            while True:
+                # keyset pagination, only the ids are loaded
+                rows = await PlayerModel.filter(id__gt=last_id).order_by("id").limit(
+                    PLAYER_CHUNK_SIZE
+                ).values_list("id", "discord_id")
+                if not rows:
+                    return
+                last_id = rows[-1][0]
+                for _, discord_id in rows:
+                    if discord_id == bot_id:
+                        skipped += 1
+                    elif keep(discord_id):
+                        await pending_ids.put(discord_id)
+
+        async def resolver():
+            nonlocal skipped
+            while True:
+                discord_id = await pending_ids.get()
                 try:
-                    result = await task
-                    results_list.append(result)
-                except Exception as e:
-                    print(f"Error distributing reward: {str(e)}")
-                    results_list.append(False)
-            for idx, user in enumerate(batch):
-                if user.id in self.bot.blacklist:
-                    blacklisted += 1
-                elif self.is_opt_out(user.id):
-                    opt_out += 1
-                elif results_list[idx]:
-                    notified += 1
-                else:
-                    failed += 1
-            await progress_message.edit(
-                content=f":gift: Distributing rewards...\nNotified: {notified}\nFailed: {failed}\nOpted-out users: {opt_out}\nBlacklisted users: {blacklisted}\nRemaining: {max(0, total - (i+batch_size))}"
-            )
-            await asyncio.sleep(1)
+                    user = bot.get_user(discord_id)
+                    if not user:
+                        try:
+                            user = await bot.fetch_user(discord_id)
+                        except Exception:
+                            user = None
+                    if user and not user.bot:
+                        await queue.put(user)
+                    else:
+                        skipped += 1
+                finally:
+                    pending_ids.task_done()
+
+        async def worker():
+            while True:
+                user = await queue.get()
+                try:
+                    # Rate limited sends are retried by the same worker once the
+                    # limiter pause is over.
+                    outcome = "failed"
+                    for attempt in range(1, MAX_SEND_ATTEMPTS + 1):
+                        await limiter.acquire()
+                        try:
+                            sent = await self.send_reward_confirmation(interaction, user, reward_info)
+                        except discord.Forbidden:
+                            outcome = "dm_closed"
+                            break
+                        except Exception as e:
+                            delay = retry_delay(e)
+                            if delay is None:
+                                print(f"Error distributing reward: {str(e)}")
+                                break
+                            limiter.rate_limited(delay)
+                        else:
+                            limiter.success()
+                            outcome = "notified" if sent else "failed"
+                            break
+                    counts[outcome] += 1
+                finally:
+                    queue.task_done()
+
+        async def report_progress():
+            while True:
+                await asyncio.sleep(PROGRESS_INTERVAL)
+                done = sum(counts.values()) + skipped
+                await show_progress(
+                    f":gift: Distributing rewards...\nNotified: {counts['notified']}\nFailed: {counts['failed']}\nDMs closed: {counts['dm_closed']}\nOpted-out users: {counts['opt_out']}\nBlacklisted users: {counts['blacklisted']}\nRemaining: {max(0, total - done)}\nRate: {limiter.rate:.1f}/s"
+                )
+
+        tasks = [asyncio.create_task(worker()) for _ in range(max(1, concurrency))]
+        tasks += [asyncio.create_task(resolver()) for _ in range(RESOLVE_CONCURRENCY)]
+        tasks.append(asyncio.create_task(report_progress()))
+        try:
+            await produce()
+            await pending_ids.join()
+            await queue.join()
+        finally:
+            for task in tasks:
+                task.cancel()
+        results["total_users"] = sum(counts.values())
+        notified = counts["notified"]
+        failed = counts["failed"] + counts["dm_closed"]
+        await show_progress(
+            f":gift: Rewards distributed.\nNotified: {notified}\nFailed: {counts['failed']}\nDMs closed: {counts['dm_closed']}\nOpted-out users: {counts['opt_out']}\nBlacklisted users: {counts['blacklisted']}\nRemaining: 0"
+        )
+        opt_out = counts["opt_out"]
+        blacklisted = counts["blacklisted"]
         results["notified_users"] = notified
         results["failed_users"] = failed
+        results["dm_closed_users"] = counts["dm_closed"]
         results["opt_out_users"] = opt_out
         results["blacklisted_users"] = blacklisted
         return results
@@ -413,19 +658,10 @@ class Rewards(commands.GroupCog, group_name="rewards"):
         self.bot.loop.create_task(self.check_reward_removal())
         
     async def check_reward_removal(self):
-        pending_rewards_copy = dict(self.reward_manager.pending_rewards)
-        expired_rewards = []
-        
-        for user_id, reward in pending_rewards_copy.items():
-            if datetime.now() > reward.expiry_time:
-                expired_rewards.append(user_id)
-                continue
-                
-        for user_id in expired_rewards:
-            if user_id in self.reward_manager.pending_rewards:
-                del self.reward_manager.pending_rewards[user_id]
-                
-        self.reward_manager.save_pending_rewards()
+        self.reward_manager.remove_expired_rewards()
+
+    async def cog_unload(self):
+        await self.reward_manager.close()
         
     async def economy_type_autocomplete(self, interaction: discord.Interaction, current: str):
         economies = await Economy.all()
@@ -597,15 +833,19 @@ class Rewards(commands.GroupCog, group_name="rewards"):
             special_event=special_event
         )
         
-        await interaction.followup.send(
+        summary = (
             f"🎁 Reward distribution completed!\n"
             f"Total users: {results['total_users']}\n"
             f"Notified: {results['notified_users']}\n"
-            f"Failed: {results['failed_users']}\n"
+            f"Failed: {results['failed_users']} (DMs closed: {results['dm_closed_users']})\n"
             f"Opted-out users: {results['opt_out_users']}\n"
             f"Blacklisted users: {results['blacklisted_users']}\n"
             f"Rewards per user: {reward_count}"
         )
+        if token_expiring(interaction):
+            await interaction.channel.send(summary)
+        else:
+            await interaction.followup.send(summary)
 
     distribute.autocomplete("economy_type")(economy_type_autocomplete)
     distribute.autocomplete("regime_type")(regime_type_autocomplete)